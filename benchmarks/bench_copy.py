@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Compare ``copy.deepcopy`` with donfig's specialized configuration copier.
+
+Run with ``python benchmarks/bench_copy.py`` with donfig installed. Large
+configurations of nested dictionaries, lists, strings and numbers are
+generated and copied with ``copy.deepcopy``, ``Config.to_dict()`` and
+``Config.to_dict(shallow_leaves=True)``.
+
+"""
+
+from __future__ import annotations
+
+import timeit
+from copy import deepcopy
+from functools import partial
+from typing import Any
+
+from donfig import Config
+
+
+def generate(sections: int, keys: int) -> dict[str, Any]:
+    return {
+        f"section-{s}": {
+            f"key-{k}": {
+                "name": f"value-{s}-{k}",
+                "size": k * 1024,
+                "ratio": k / 3,
+                "enabled": bool(k % 2),
+                "items": [k, str(k), {"nested": None}],
+            }
+            for k in range(keys)
+        }
+        for s in range(sections)
+    }
+
+
+def main() -> None:
+    print(f"{'leaves':>8}{'deepcopy ms':>14}{'to_dict ms':>14}{'shallow ms':>14}{'speedup':>10}")
+    for sections, keys in [(10, 10), (50, 100), (100, 500)]:
+        config = Config("bench", paths=[], env={})
+        config.update(generate(sections, keys))
+        number = max(1, 20_000 // (sections * keys))
+        deep = min(timeit.repeat(partial(deepcopy, config.config), number=number, repeat=3)) / number
+        fast = min(timeit.repeat(config.to_dict, number=number, repeat=3)) / number
+        shallow = min(timeit.repeat(partial(config.to_dict, shallow_leaves=True), number=number, repeat=3)) / number
+        leaves = sections * keys * 7
+        print(f"{leaves:>8}{deep * 1e3:>14.2f}{fast * 1e3:>14.2f}{shallow * 1e3:>14.2f}{deep / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Compare ``Config.set`` with a reusable ``Config.prepare_set`` patch.
+
+Run with ``python benchmarks/bench_set.py`` with donfig installed. For both
+approaches the time per context manager entry and exit and the memory
+allocated per entry (measured with :mod:`tracemalloc`) are reported.
+
+"""
+
+from __future__ import annotations
+
+import timeit
+import tracemalloc
+from collections.abc import Callable
+
+from donfig import Config
+
+NUMBER = 20_000
+VALUES = {
+    "array.chunk-size": "128MiB",
+    "array.slicing.split_large_chunks": True,
+    "scheduler": "threads",
+    "optimization.fuse.ave-width": 2,
+}
+
+
+def make_config(persistent: bool, normalize_keys: bool) -> Config:
+    config = Config(
+        "bench",
+        paths=[],
+        env={},
+        deprecations={"fuse_ave_width": "optimization.fuse.ave-width"},
+        persistent=persistent,
+        normalize_keys=normalize_keys,
+    )
+    config.update(
+        {
+            "array": {"chunk-size": "64MiB", "slicing": {"split-large-chunks": None}},
+            "optimization": {"fuse": {"ave-width": 1}},
+            "other": {f"key-{i}": i for i in range(100)},
+        }
+    )
+    return config
+
+
+def with_set(config: Config) -> Callable[[], None]:
+    def run() -> None:
+        with config.set(VALUES):
+            pass
+
+    return run
+
+
+def with_patch(config: Config) -> Callable[[], None]:
+    patch = config.prepare_set(VALUES)
+
+    def run() -> None:
+        with patch:
+            pass
+
+    return run
+
+
+def peak_allocation(func: Callable[[], None], number: int = 100) -> float:
+    """Return the average peak of memory allocated while running ``func`` once."""
+    func()
+    total = 0
+    tracemalloc.start()
+    for _ in range(number):
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - start
+    tracemalloc.stop()
+    return total / number
+
+
+def main() -> None:
+    print(f"{'storage':<12}{'method':<14}{'us/entry':>10}{'peak bytes/entry':>20}")
+    for storage, persistent, normalize_keys in [
+        ("dict", False, False),
+        ("persistent", True, False),
+        ("normalized", False, True),
+    ]:
+        for name, factory in [("set", with_set), ("prepare_set", with_patch)]:
+            func = factory(make_config(persistent, normalize_keys))
+            seconds = min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+            peak = peak_allocation(func)
+            print(f"{storage:<12}{name:<14}{seconds * 1e6:>10.2f}{peak:>20.0f}")
+
+
+if __name__ == "__main__":
+    main()
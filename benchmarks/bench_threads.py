@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Measure how ``Config.get`` throughput scales with the number of reader threads.
+
+Run with ``python benchmarks/bench_threads.py`` with donfig installed, ideally
+on a free-threaded build of CPython (``python3.13t`` or later) where readers
+can run in parallel. For every storage mode, N reader threads call
+``Config.get`` in a loop while one writer thread alternates between entering
+and exiting ``Config.set`` on an unrelated subtree and ``Config.refresh``.
+The total number of reads per second, the speedup over a single reader and
+the number of reads that found a key missing, which must be 0 as refreshes
+replace the whole configuration at once, are reported.
+
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+
+from donfig import Config
+
+DURATION = 1.0
+KEYS = ["array.chunk-size", "array.slicing.split-large-chunks", "optimization.fuse.ave-width", "other.key-50"]
+MISSING = object()
+DEFAULTS = {
+    "array": {"chunk-size": "64MiB", "slicing": {"split-large-chunks": None}},
+    "optimization": {"fuse": {"ave-width": 1}},
+    "other": {f"key-{i}": i for i in range(100)},
+    "scheduler": {"work-stealing": True},
+}
+
+
+def make_config(persistent: bool = False, lock_stripe_depth: int = 0) -> Config:
+    # defaults survive refresh, values set with update would not
+    return Config(
+        "bench", paths=[], env={}, defaults=[DEFAULTS], persistent=persistent, lock_stripe_depth=lock_stripe_depth
+    )
+
+
+def run(config: Config, readers: int) -> tuple[float, int]:
+    """Return the reads per second of ``readers`` threads with one concurrent writer and the torn reads."""
+    counts = [0] * readers
+    torn = [0] * readers
+    stop = threading.Event()
+    start = threading.Barrier(readers + 2)
+
+    def read(index: int) -> None:
+        get = config.get
+        n = missing = 0
+        start.wait()
+        while not stop.is_set():
+            for key in KEYS:
+                if get(key, MISSING) is MISSING:
+                    missing += 1
+            n += len(KEYS)
+        counts[index] = n
+        torn[index] = missing
+
+    def write() -> None:
+        start.wait()
+        while not stop.is_set():
+            with config.set({"scheduler.work-stealing": False}):
+                pass
+            config.refresh()
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - began), sum(torn)
+
+
+def main() -> None:
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs")
+    counts = [n for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)]
+    print(f"{'storage':<12}{'readers':>8}{'reads/s':>14}{'speedup':>9}{'torn':>6}")
+    for storage, config in [
+        ("dict", make_config()),
+        ("persistent", make_config(persistent=True)),
+        ("striped", make_config(lock_stripe_depth=1)),
+    ]:
+        base = None
+        for readers in counts:
+            rate, torn = run(config, readers)
+            base = base or rate
+            print(f"{storage:<12}{readers:>8}{rate:>14,.0f}{rate / base:>9.2f}{torn:>6}")
+
+
+if __name__ == "__main__":
+    main()
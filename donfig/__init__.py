@@ -1,7 +1,10 @@
 from importlib.metadata import PackageNotFoundError
 from importlib.metadata import version as _version
 
-from .config_obj import Config, deserialize, serialize  # noqa
+from ._cache import clear_caches, file_cache_info
+from .config_obj import Config, deserialize, serialize
+
+__all__ = ["Config", "clear_caches", "deserialize", "file_cache_info", "serialize"]
 
 try:
     __version__ = _version("donfig")
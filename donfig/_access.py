@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Recording of configuration key accesses.
+
+This module should be considered private and should not be imported directly
+by users. Use :meth:`donfig.Config.start_access_recording` instead.
+
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import Counter
+from collections.abc import Mapping
+from types import FrameType
+from typing import Any
+
+from ._tree import iter_leaves, normalize_key
+
+
+class AccessRecorder:
+    """Aggregate counts of configuration key lookups.
+
+    Only every ``sample_every``-th lookup is recorded to keep the overhead
+    bounded on hot paths. Counts in the report are the sampled counts.
+
+    """
+
+    def __init__(self, sample_every: int = 1) -> None:
+        if sample_every < 1:
+            raise ValueError("'sample_every' must be a positive integer")
+        self.sample_every = sample_every
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self.callers: dict[str, Counter[str]] = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, key: str, hit: bool) -> None:
+        self._calls += 1
+        if self._calls % self.sample_every:
+            return
+        key = normalize_key(key)
+        caller = _caller_module()
+        with self._lock:
+            if hit:
+                self.hits[key] += 1
+            else:
+                self.misses[key] += 1
+            self.callers.setdefault(key, Counter())[caller] += 1
+
+    def report(self, config: Mapping[str, Any], top: int = 20) -> dict[str, Any]:
+        """Summarize recorded accesses against the current configuration.
+
+        Parameters
+        ----------
+        config : Mapping
+            Configuration used to find keys that were never read.
+        top : int
+            Number of entries to include in the ``hot`` and ``misses`` lists.
+
+        Returns
+        -------
+        report : dict
+            ``hot`` lists the most read keys with their callers, ``misses``
+            the most looked up keys that fell back to a default or raised,
+            and ``unread`` every leaf key of ``config`` for which neither the
+            key itself nor one of its parents was read.
+
+        """
+        with self._lock:
+            hits = Counter(self.hits)
+            misses = Counter(self.misses)
+            callers = {k: dict(v) for k, v in self.callers.items()}
+
+        read = set(hits)
+        unread = []
+        for path, _ in iter_leaves(config):
+            normalized = [normalize_key(k) for k in path]
+            if not any(".".join(normalized[:i]) in read for i in range(1, len(normalized) + 1)):
+                unread.append(".".join(path))
+
+        return {
+            "sample_every": self.sample_every,
+            "sampled": sum(hits.values()) + sum(misses.values()),
+            "hot": [{"key": k, "count": c, "callers": callers.get(k, {})} for k, c in hits.most_common(top)],
+            "misses": [{"key": k, "count": c, "callers": callers.get(k, {})} for k, c in misses.most_common(top)],
+            "unread": sorted(unread),
+        }
+
+
+def _caller_module() -> str:
+    """Find the first module outside of donfig's config object on the stack."""
+    frame: FrameType | None = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") == "donfig.config_obj":
+        frame = frame.f_back
+    if frame is None:
+        return "<unknown>"
+    return str(frame.f_globals.get("__name__", "<unknown>"))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Process wide caches shared by all configuration objects.
+
+This module should be considered private and should not be imported directly
+by users. Use :func:`donfig.clear_caches` to reset the caches.
+
+"""
+
+from __future__ import annotations
+
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from hashlib import blake2b
+from typing import Any, NamedTuple
+
+from ._lazy import LazyDict
+from ._tree import copy_tree
+
+# How long a search path that does not exist is assumed to stay missing
+NEGATIVE_TTL = 1.0
+# Listings of directories modified more recently than this are not cached,
+# a second change within the timestamp resolution would go unnoticed
+_SETTLE_NS = 1_000_000_000
+
+# Maximum number of parsed files kept
+FILE_CACHE_SIZE = 128
+
+# Maximum number of decoded configurations inherited from a parent process kept
+INHERITED_CACHE_SIZE = 4
+
+_EXTENSIONS = (".json", ".yaml", ".yml")
+
+_lock = threading.Lock()
+_listings: dict[str, tuple[tuple[int, int, int, int], tuple[str, ...]]] = {}
+_missing: dict[str, float] = {}
+_parsed: OrderedDict[Hashable, Any] = OrderedDict()
+_inherited: OrderedDict[bytes, Any] = OrderedDict()
+_hits = 0
+_misses = 0
+
+
+class CacheInfo(NamedTuple):
+    """Cache statistics, see :func:`donfig.file_cache_info`."""
+
+    hits: int
+    misses: int
+    maxsize: int | None
+    currsize: int
+
+
+def find_config_files(path: str) -> list[str]:
+    """Find the configuration files at a search path.
+
+    A directory is listed for yaml and json files, a file is returned as is
+    and missing or unreadable paths yield nothing. Directory listings are
+    cached until the directory changes and missing paths are remembered for
+    ``NEGATIVE_TTL`` seconds.
+
+    """
+    now = time.monotonic()
+    expires = _missing.get(path)
+    if expires is not None and expires > now:
+        return []
+    try:
+        st = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        with _lock:
+            if len(_missing) > 1024:
+                for p, e in list(_missing.items()):
+                    if e <= now:
+                        del _missing[p]
+            _missing[path] = now + NEGATIVE_TTL
+        return []
+    except OSError:
+        return []
+    if expires is not None:
+        with _lock:
+            _missing.pop(path, None)
+    if not stat.S_ISDIR(st.st_mode):
+        return [path]
+
+    key = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_ctime_ns)
+    cached = _listings.get(path)
+    if cached is not None and cached[0] == key:
+        return list(cached[1])
+    try:
+        with os.scandir(path) as it:
+            names = sorted(e.name for e in it if os.path.splitext(e.name)[1].lower() in _EXTENSIONS)
+    except OSError:
+        # Ignore permission errors
+        return []
+    files = tuple(os.path.join(path, name) for name in names)
+    if time.time_ns() - st.st_mtime_ns > _SETTLE_NS:
+        with _lock:
+            _listings[path] = (key, files)
+    return list(files)
+
+
+def forget_path(path: str) -> None:
+    """Drop everything cached about the search path ``path``."""
+    with _lock:
+        _missing.pop(path, None)
+        _listings.pop(path, None)
+
+
+def file_key(st: os.stat_result, variant: Hashable) -> Hashable | None:
+    """Identify the content of a file by its status, or ``None`` if it may still change unnoticed."""
+    if time.time_ns() - st.st_mtime_ns <= _SETTLE_NS:
+        return None
+    # device and inode identify the file no matter which (symbolic) path led to it
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, variant)
+
+
+def lookup_parsed(key: Hashable | None) -> tuple[bool, Any]:
+    """Look up the parsed content of a file, returning ``(found, copy of content)``."""
+    global _hits, _misses
+    with _lock:
+        if key is None or key not in _parsed:
+            _misses += 1
+            return False, None
+        _parsed.move_to_end(key)
+        _hits += 1
+        config = _parsed[key]
+    return True, copy_parsed(config)
+
+
+def store_parsed(key: Hashable | None, config: Any) -> bool:
+    """Cache the parsed content of a file, it must not be modified afterwards if this returns True."""
+    if key is None or FILE_CACHE_SIZE <= 0:
+        return False
+    with _lock:
+        _parsed[key] = config
+        _parsed.move_to_end(key)
+        while len(_parsed) > FILE_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return True
+
+
+def copy_parsed(config: Any) -> Any:
+    """Copy the parsed content of a file, keeping lazily constructed sections lazy."""
+    if type(config) is not dict:
+        return copy_tree(config)
+    return {k: v.clone() if type(v) is LazyDict else copy_tree(v) for k, v in config.items()}
+
+
+def decode_inherited(data: str, decode: Callable[[str], Any]) -> Any:
+    """Decode a serialized configuration once per process and return a fresh copy.
+
+    The cache is keyed by a digest of ``data`` so that large serialized
+    configurations are not kept around twice.
+
+    """
+    key = blake2b(data.encode(), digest_size=16).digest()
+    with _lock:
+        try:
+            value = _inherited[key]
+        except KeyError:
+            pass
+        else:
+            _inherited.move_to_end(key)
+            return copy_tree(value, shallow_leaves=True)
+    value = decode(data)
+    with _lock:
+        _inherited[key] = value
+        while len(_inherited) > INHERITED_CACHE_SIZE:
+            _inherited.popitem(last=False)
+    # JSON leaves are immutable, only the containers need copying
+    return copy_tree(value, shallow_leaves=True)
+
+
+def file_cache_info() -> CacheInfo:
+    """Statistics of the process wide cache of parsed configuration files.
+
+    Files found by :func:`donfig.config_obj.collect_yaml` are parsed once per
+    process and shared by all configuration objects until they change on
+    disk. Every configuration object receives its own copy of the content.
+
+    """
+    with _lock:
+        return CacheInfo(_hits, _misses, FILE_CACHE_SIZE, len(_parsed))
+
+
+def clear_caches() -> None:
+    """Clear all process wide caches used when collecting configuration.
+
+    Missing search paths are remembered for a short time, call this after
+    creating a configuration directory to have the next
+    :meth:`~donfig.Config.refresh` pick it up immediately. This also empties
+    the caches of parsed files and of configurations inherited from parent
+    processes and resets their statistics.
+
+    """
+    global _hits, _misses
+    with _lock:
+        _missing.clear()
+        _listings.clear()
+        _parsed.clear()
+        _inherited.clear()
+        _hits = _misses = 0
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Incrementally maintained digests of configuration trees.
+
+This module should be considered private and should not be imported directly
+by users. Use :meth:`donfig.Config.fingerprint` instead.
+
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable, Mapping
+from hashlib import blake2b
+from typing import Any
+
+from ._tree import normalize_path
+
+_DIGEST_SIZE = 16
+
+
+class _Node:
+    """Cached digest of one mapping in the tree and the cache of its children."""
+
+    __slots__ = ("digest", "children")
+
+    def __init__(self) -> None:
+        self.digest: bytes | None = None
+        self.children: dict[Any, _Node] = {}
+
+
+class DigestCache:
+    """Digests of configuration subtrees, cached until a change touches them.
+
+    The cache mirrors the nesting of the configuration. Invalidating a path
+    drops the cached digests of the path itself, everything below it and
+    every mapping above it, so recomputing a fingerprint after a change only
+    rehashes the mappings along the changed paths.
+
+    """
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._epoch = 0
+        self._lock = threading.Lock()
+        # whether a digest was ever requested, until then there is nothing to invalidate
+        self._used = False
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # cached digests are cheap to rebuild, never send them along
+        return DigestCache, ()
+
+    def invalidate(self, paths: Iterable[tuple[Any, ...]] | None) -> None:
+        """Forget digests overlapping the key ``paths``, or all digests if ``paths`` is None."""
+        if not self._used:
+            # keeps changes cheap for configurations of which no fingerprint is taken
+            return
+        with self._lock:
+            self._epoch += 1
+            if paths is None:
+                self._root = _Node()
+                return
+            for path in paths:
+                _invalidate(self._root, normalize_path(path))
+
+    def digest(self, path: tuple[Any, ...], value: Any) -> bytes:
+        """Digest of ``value``, found at the (stored) key ``path`` of the configuration."""
+        if not isinstance(value, Mapping):
+            return leaf_digest(value)
+        with self._lock:
+            self._used = True
+            epoch = self._epoch
+            node = self._root
+            for k in path:
+                node = node.children.setdefault(k, _Node())
+        return self._mapping_digest(node, value, epoch)
+
+    def _mapping_digest(self, node: _Node, value: Mapping[Any, Any], epoch: int) -> bytes:
+        digest = node.digest
+        if digest is not None:
+            return digest
+        h = blake2b(b"m", digest_size=_DIGEST_SIZE)
+        children = node.children
+        update = h.update
+        for k in sorted(value, key=_sort_key):
+            v = value[k]
+            if type(k) is str:
+                # length-prefixed so key and value boundaries stay unambiguous
+                kb = k.encode("utf-8", "surrogatepass")
+                update(b"s%d:" % len(kb))
+                update(kb)
+            else:
+                update(b"k" + leaf_digest(k))
+            if type(v) is dict or isinstance(v, Mapping):
+                child = children.get(k)
+                if child is None:
+                    child = children.setdefault(k, _Node())
+                update(self._mapping_digest(child, v, epoch))
+            else:
+                update(leaf_digest(v))
+        digest = h.digest()
+        with self._lock:
+            # a change since we started may not be included in this digest
+            if self._epoch == epoch:
+                node.digest = digest
+        return digest
+
+
+def _invalidate(node: _Node, path: tuple[Any, ...]) -> None:
+    node.digest = None
+    if not path:
+        node.children.clear()
+        return
+    head, rest = path[0], path[1:]
+    for k in [k for k in node.children if normalize_path((k,))[0] == head]:
+        if rest:
+            _invalidate(node.children[k], rest)
+        else:
+            del node.children[k]
+
+
+def _sort_key(key: Any) -> tuple[str, str]:
+    return type(key).__name__, str(key)
+
+
+def leaf_digest(value: Any) -> bytes:
+    """Digest of a value that is not cached.
+
+    Plain data (strings, numbers, containers of those, ...) get the same
+    digest in every process. Other objects are represented by their type and
+    ``repr``.
+
+    """
+    h = blake2b(type(value).__qualname__.encode(), digest_size=_DIGEST_SIZE)
+    if isinstance(value, str):
+        h.update(value.encode("utf-8", "surrogatepass"))
+    elif isinstance(value, bytes):
+        h.update(value)
+    elif isinstance(value, Mapping):
+        for k in sorted(value, key=_sort_key):
+            h.update(leaf_digest(k))
+            h.update(leaf_digest(value[k]))
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            h.update(leaf_digest(v))
+    elif isinstance(value, (set, frozenset)):
+        for d in sorted(leaf_digest(v) for v in value):
+            h.update(d)
+    else:
+        h.update(repr(value).encode("utf-8", "surrogatepass"))
+    return h.digest()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Configuration sections that are only built when first accessed.
+
+This module should be considered private and should not be imported directly
+by users. Lazy loading is enabled with ``Config(..., lazy_load=True)``.
+
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections.abc import Callable, Mapping
+from copy import deepcopy
+from functools import partial
+from typing import Any
+
+import yaml
+
+_materialize_lock = threading.RLock()
+
+# Only the parser differs, resolving and constructing is shared with yaml.SafeLoader
+_ComposeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class LazyDict(dict):  # type: ignore[type-arg]
+    """Dictionary whose content is produced by ``loader`` on first access.
+
+    Any access to the dictionary, read or write, first materializes it in
+    place. After that it behaves exactly like a normal dictionary.
+
+    """
+
+    __slots__ = ("_loader",)
+
+    def __init__(self, loader: Callable[[], Mapping[str, Any]]) -> None:
+        dict.__init__(self)
+        self._loader: Callable[[], Mapping[str, Any]] | None = loader
+
+    @property
+    def is_lazy(self) -> bool:
+        """Whether the content has not been built yet."""
+        return self._loader is not None
+
+    def materialize(self) -> None:
+        if self._loader is None:
+            return
+        with _materialize_lock:
+            loader = self._loader
+            if loader is not None:
+                dict.update(self, loader())
+                self._loader = None
+
+    def clone(self) -> LazyDict:
+        """Return an independent dictionary with the same content, still lazy if possible."""
+        loader = self._loader
+        if loader is not None:
+            return LazyDict(loader)
+        return LazyDict(partial(deepcopy, dict(self)))
+
+    def __eq__(self, other: object) -> bool:
+        self.materialize()
+        if isinstance(other, LazyDict):
+            other.materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    __hash__ = None
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        self.materialize()
+        return dict, (dict(self),)
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> dict[str, Any]:
+        self.materialize()
+        return {k: deepcopy(v, memo) for k, v in self.items()}
+
+
+def _materializing(name: str) -> Callable[..., Any]:
+    method = getattr(dict, name)
+
+    def wrapper(self: LazyDict, *args: Any, **kwargs: Any) -> Any:
+        self.materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in (
+    "__getitem__",
+    "__setitem__",
+    "__delitem__",
+    "__contains__",
+    "__iter__",
+    "__reversed__",
+    "__len__",
+    "__repr__",
+    "__or__",
+    "__ror__",
+    "__ior__",
+    "get",
+    "keys",
+    "values",
+    "items",
+    "copy",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+    "clear",
+):
+    setattr(LazyDict, _name, _materializing(_name))
+del _name
+
+
+class _InterningLoader(yaml.SafeLoader):
+    """SafeLoader interning the string keys of mappings as they are constructed.
+
+    Files repeat the same keys many times and every refresh parses them
+    again, interning makes all of them share one string object per key.
+
+    """
+
+    def flatten_mapping(self, node: yaml.MappingNode) -> None:
+        super().flatten_mapping(node)
+        for key_node, _ in node.value:
+            if isinstance(key_node, yaml.ScalarNode):
+                # plain strings are constructed as the value of their node
+                key_node.value = sys.intern(key_node.value)
+
+
+def load_yaml(text: str) -> Any:
+    """Parse a YAML document like ``yaml.safe_load``, interning mapping keys."""
+    return yaml.load(text, Loader=_InterningLoader)
+
+
+def _construct(node: yaml.Node) -> Any:
+    loader = _InterningLoader("")
+    try:
+        return loader.construct_document(node)
+    finally:
+        loader.dispose()
+
+
+def _construct_section(path: str, node: yaml.Node) -> Any:
+    try:
+        return _construct(node)
+    except Exception as exc:
+        # same error as for files loaded eagerly
+        raise ValueError(f"A config file at {path!r} is malformed, original error message:\n\n{exc}") from None
+
+
+def load_yaml_lazy(text: str, path: str) -> Any:
+    """Parse a YAML document, deferring construction of top level mapping sections.
+
+    The document is composed into a node graph once, using the libyaml parser
+    if available. Top level keys and scalar values are constructed
+    immediately, but every top level value that is a mapping becomes a
+    :class:`LazyDict` constructing its Python objects from the node graph
+    when first accessed, raising a ``ValueError`` naming the file at ``path``
+    if that fails. The result is equal to ``yaml.safe_load(text)``.
+
+    """
+    loader = _ComposeLoader(text)
+    try:
+        node = loader.get_single_node()
+    finally:
+        loader.dispose()
+    if node is None:
+        return None
+    if not isinstance(node, yaml.MappingNode):
+        return _construct(node)
+    # resolve merge keys ("<<") of the top level mapping
+    _InterningLoader("").flatten_mapping(node)
+    result: dict[str, Any] = {}
+    for key_node, value_node in node.value:
+        key = _construct(key_node)
+        if isinstance(value_node, yaml.MappingNode):
+            result[key] = LazyDict(partial(_construct_section, path, value_node))
+        else:
+            result[key] = _construct(value_node)
+    return result
@@ -40,18 +40,23 @@ class SerializableLock:
     This is useful for consistently protecting resources on a per-process
     level.
 
-    The creation of locks is itself not threadsafe.
+    Locks can be created and deserialized from any number of threads at once,
+    objects with the same token always wrap the same lock.
     """
 
+    __slots__ = ("token", "lock")
+
     _locks: WeakValueDictionary[str, Lock] = WeakValueDictionary()
+    # the check and insertion into _locks must be atomic, also without the GIL
+    _locks_lock = Lock()
 
     def __init__(self, token: str | None = None) -> None:
         self.token = token or str(uuid.uuid4())
-        if self.token in SerializableLock._locks:
-            self.lock = SerializableLock._locks[self.token]
-        else:
-            self.lock = Lock()
-            SerializableLock._locks[self.token] = self.lock
+        with SerializableLock._locks_lock:
+            lock = SerializableLock._locks.get(self.token)
+            if lock is None:
+                lock = SerializableLock._locks[self.token] = Lock()
+        self.lock = lock
 
     def acquire(self, *args: Any, **kwargs: Any) -> bool:
         return self.lock.acquire(*args, **kwargs)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Memoization of functions and values depending on configuration keys.
+
+This module should be considered private and should not be imported directly
+by users. Use :meth:`donfig.Config.memoize` and :meth:`donfig.Config.derive`
+instead.
+
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import types
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sequence
+from typing import TYPE_CHECKING, Any, Generic, ParamSpec, Protocol, TypeVar
+
+from ._cache import CacheInfo
+from ._tree import normalize_key, paths_overlap
+
+if TYPE_CHECKING:
+    from .config_obj import Config
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+class ConfigListener(Protocol):
+    def config_changed(self, paths: Sequence[tuple[Any, ...]] | None) -> None:
+        """Called with the normalized key paths that changed, or None if anything may have changed."""
+
+
+class Memoized(Generic[P, R]):
+    """Function wrapper caching results per arguments and configuration state.
+
+    The state is made of the fingerprints of the declared configuration
+    keys, so results computed under a temporary ``config.set`` are kept apart
+    from the results for the regular configuration. The fingerprints are
+    only recomputed after a change overlapping one of the keys.
+
+    """
+
+    def __init__(self, config: Config, keys: Sequence[str], maxsize: int | None, func: Callable[P, R]) -> None:
+        self._config = config
+        self._keys = list(keys)
+        self._paths = [tuple(normalize_key(key).split(".")) for key in self._keys]
+        self._maxsize = maxsize
+        self._func = func
+        self._cache: OrderedDict[Hashable, R] = OrderedDict()
+        self._state: tuple[str | None, ...] | None = None
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, func)
+        config._listeners.add(self)
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> R:
+        epoch = self._epoch
+        state = self._state
+        if state is None:
+            state = self._fingerprints()
+            with self._lock:
+                if self._epoch == epoch:
+                    self._state = state
+        key = (state, args, tuple(sorted(kwargs.items()))) if kwargs else (state, args)
+        with self._lock:
+            try:
+                result = self._cache[key]
+            except KeyError:
+                self._misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return result
+        result = self._func(*args, **kwargs)
+        with self._lock:
+            # the configuration changed while computing, the result may mix both states
+            if self._epoch == epoch:
+                self._cache[key] = result
+                if self._maxsize is not None and len(self._cache) > self._maxsize:
+                    self._cache.popitem(last=False)
+        return result
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Any:
+        if instance is None:
+            return self
+        return types.MethodType(self, instance)
+
+    def _fingerprints(self) -> tuple[str | None, ...]:
+        state: list[str | None] = []
+        for key in self._keys:
+            try:
+                state.append(self._config.fingerprint(key))
+            except (TypeError, IndexError, KeyError):
+                state.append(None)
+        return tuple(state)
+
+    def config_changed(self, paths: Sequence[tuple[Any, ...]] | None) -> None:
+        if paths is not None and not any(paths_overlap(p, q) for p in paths for q in self._paths):
+            return
+        with self._lock:
+            self._epoch += 1
+            self._state = None
+
+    def cache_info(self) -> CacheInfo:
+        """Hits, misses, maximum and current size of the cache."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._cache))
+
+    def cache_clear(self) -> None:
+        """Empty the cache and reset its statistics."""
+        with self._lock:
+            self._epoch += 1
+            self._cache.clear()
+            self._hits = self._misses = 0
+
+
+class DerivedValue:
+    """Value computed from configuration keys, cached until one of them changes."""
+
+    def __init__(self, config: Config, key: str, func: Callable[..., Any], depends_on: Sequence[str]) -> None:
+        self._config = config
+        self.key = key
+        self.path = tuple(normalize_key(key).split("."))
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.dependency_paths = [tuple(normalize_key(dep).split(".")) for dep in self.depends_on]
+        self._value: Any = None
+        self._valid = False
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        epoch = self._epoch
+        if self._valid:
+            return self._value
+        value = self.func(*(self._config.get(dep) for dep in self.depends_on))
+        with self._lock:
+            if self._epoch == epoch:
+                self._value = value
+                self._valid = True
+        return value
+
+    def depends_on_path(self, path: tuple[Any, ...]) -> bool:
+        return any(paths_overlap(path, dep) for dep in self.dependency_paths)
+
+    def config_changed(self, paths: Sequence[tuple[Any, ...]] | None) -> None:
+        if paths is not None and not any(self.depends_on_path(p) for p in paths):
+            return
+        with self._lock:
+            self._epoch += 1
+            self._valid = False
+            self._value = None
+        if paths is not None:
+            # values and memoized functions depending on this one are affected too
+            self._config._notify([self.path])
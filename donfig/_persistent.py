@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Persistent (immutable, path-copying) nested mapping.
+
+This module should be considered private and should not be imported directly
+by users. Persistent storage is enabled with ``Config(..., persistent=True)``.
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from copy import deepcopy
+from typing import Any, NoReturn
+
+
+class PersistentMap(dict):  # type: ignore[type-arg]
+    """Immutable nested mapping sharing unchanged subtrees between versions.
+
+    Nested mappings are converted to ``PersistentMap`` on construction. All
+    modifying operations return a new map and only copy the mappings along the
+    modified path; every other subtree is reused by reference. This makes
+    snapshots free and merges proportional to the size of the change.
+
+    It subclasses ``dict`` so that lookups stay as fast as for the plain
+    dictionaries used by default, but any in-place modification raises a
+    ``TypeError``. Only the mappings are immutable, other values like lists
+    are stored as is and shared between versions.
+
+    """
+
+    __slots__ = ()
+
+    def __init__(self, data: Mapping[str, Any] | Iterable[tuple[str, Any]] = (), /) -> None:
+        items = data.items() if isinstance(data, Mapping) else data
+        dict.__init__(self, ((k, freeze(v)) for k, v in items))
+
+    def _copy(self) -> PersistentMap:
+        """Shallow copy to build a new version from, before it is published."""
+        new = PersistentMap.__new__(PersistentMap)
+        dict.update(new, self)
+        return new
+
+    def _immutable(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError(f"{type(self).__name__} is immutable, use 'set', 'set_in' or 'delete_in' instead")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self) -> PersistentMap:
+        return self
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> PersistentMap:
+        new = PersistentMap.__new__(PersistentMap)
+        dict.update(new, ((k, deepcopy(v, memo)) for k, v in self.items()))
+        return new
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return PersistentMap, (dict(self),)
+
+    def set(self, key: str, value: Any) -> PersistentMap:
+        """Return a copy of this map with ``key`` set to ``value``."""
+        new = self._copy()
+        dict.__setitem__(new, key, freeze(value))
+        return new
+
+    def set_many(self, changes: Mapping[str, Any]) -> PersistentMap:
+        """Return a copy of this map with all top level ``changes`` applied."""
+        if not changes:
+            return self
+        new = self._copy()
+        for k, v in changes.items():
+            dict.__setitem__(new, k, freeze(v))
+        return new
+
+    def delete(self, key: str) -> PersistentMap:
+        """Return a copy of this map without ``key``."""
+        if key not in self:
+            return self
+        new = self._copy()
+        dict.__delitem__(new, key)
+        return new
+
+    def set_in(self, keys: Sequence[str], value: Any) -> PersistentMap:
+        """Return a copy with the value at the nested path ``keys`` replaced.
+
+        Missing intermediate levels, or levels that are not mappings, are
+        replaced by new mappings.
+
+        """
+        key = keys[0]
+        if len(keys) == 1:
+            return self.set(key, value)
+        child = self.get(key)
+        if not isinstance(child, PersistentMap):
+            child = EMPTY
+        return self.set(key, child.set_in(keys[1:], value))
+
+    def delete_in(self, keys: Sequence[str]) -> PersistentMap:
+        """Return a copy without the value at the nested path ``keys``."""
+        key = keys[0]
+        if len(keys) == 1:
+            return self.delete(key)
+        child = self.get(key)
+        if not isinstance(child, PersistentMap):
+            return self
+        new_child = child.delete_in(keys[1:])
+        if new_child is child:
+            return self
+        return self.set(key, new_child)
+
+    def thaw(self) -> dict[str, Any]:
+        """Convert to nested plain dictionaries. Leaf values are not copied."""
+        return {k: v.thaw() if isinstance(v, PersistentMap) else v for k, v in self.items()}
+
+
+# common types freeze returns as is, lists and tuples included: only mappings are converted
+_UNCONVERTED = frozenset({str, int, float, bool, type(None), bytes, list, tuple})
+
+
+def freeze(value: Any) -> Any:
+    """Convert nested mappings in ``value`` to :class:`PersistentMap`."""
+    cls = type(value)
+    # avoid the comparatively slow ABC instance check for common types
+    if cls is PersistentMap or cls in _UNCONVERTED:
+        return value
+    if cls is dict or isinstance(value, Mapping):
+        return PersistentMap(value)
+    return value
+
+
+EMPTY = PersistentMap()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Reloading configuration when the process receives a signal.
+
+This module should be considered private and should not be imported directly
+by users. Use :meth:`donfig.Config.reload_on_signal` instead.
+
+"""
+
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+import time
+from collections.abc import Mapping
+from types import FrameType
+from typing import TYPE_CHECKING, Any
+
+from ._lazy import LazyDict
+from ._tree import iter_leaves
+
+if TYPE_CHECKING:
+    from .config_obj import Config
+
+logger = logging.getLogger("donfig.reload")
+
+_MISSING = object()
+
+
+class SignalReloader:
+    """Reload a configuration in a worker thread whenever a signal is received.
+
+    The signal handler only sets a flag. The worker thread rebuilds the
+    configuration from its search paths and environment without holding any
+    lock and publishes the result by swapping the ``config`` attribute under
+    ``config_lock``. Signals received while a reload is running cause exactly
+    one more reload.
+
+    Attributes
+    ----------
+    reloads : int
+        Number of completed reloads.
+    last_reload : dict or None
+        ``seconds`` the last reload took, the number of ``changed`` keys and
+        the ``error`` message if it failed (the configuration is kept as is).
+        Lazily loaded sections that were not read before or after the reload
+        are not compared and do not count as changed.
+
+    """
+
+    def __init__(self, config: Config, signum: int) -> None:
+        self.config = config
+        self.signum = signum
+        self.reloads = 0
+        self.last_reload: dict[str, Any] | None = None
+        self._requested = threading.Event()
+        self._request_count = 0
+        self._handled_count = 0
+        self._stopped = False
+        self._completed = threading.Condition()
+        self._previous = signal.signal(signum, self._handle)
+        self._thread = threading.Thread(target=self._run, name=f"donfig-reload-{config.name}", daemon=True)
+        self._thread.start()
+
+    def _handle(self, signum: int, frame: FrameType | None) -> None:
+        # never do more than this in the signal handler, it may interrupt code holding config_lock
+        self._request_count += 1
+        self._requested.set()
+
+    def trigger(self) -> None:
+        """Request a reload as if the signal was received."""
+        self._request_count += 1
+        self._requested.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until all reloads requested so far completed, return False on timeout."""
+        target = self._request_count
+        with self._completed:
+            return self._completed.wait_for(lambda: self._handled_count >= target, timeout)
+
+    def stop(self) -> None:
+        """Restore the previous signal handler and stop the worker thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        signal.signal(self.signum, self._previous)
+        self._requested.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            if self._stopped:
+                return
+            handled = self._request_count
+            self._reload(handled)
+
+    def _reload(self, handled: int) -> None:
+        config = self.config
+        start = time.perf_counter()
+        record: dict[str, Any] = {"seconds": None, "changed": None, "error": None}
+        try:
+            new, spellings = config._build("reload")
+            # the old root is not modified anymore once the new one is published
+            old = config.config
+            config._publish(new, spellings)
+            record["changed"] = count_changes(old, new)
+            record["seconds"] = time.perf_counter() - start
+            logger.info(
+                "Reloaded %r configuration in %.3f seconds, %d keys changed",
+                config.name,
+                record["seconds"],
+                record["changed"],
+            )
+        except Exception as exc:
+            record["seconds"] = time.perf_counter() - start
+            record["error"] = str(exc)
+            logger.exception("Reloading %r configuration failed, keeping the current configuration", config.name)
+        with self._completed:
+            self.last_reload = record
+            self.reloads += 1
+            self._handled_count = handled
+            self._completed.notify_all()
+
+
+def count_changes(old: Mapping[str, Any], new: Mapping[str, Any]) -> int:
+    """Number of leaves added, removed or modified between two configuration trees.
+
+    Subtrees are compared level by level and lazily loaded sections that were
+    not loaded in either tree are skipped instead of being loaded.
+
+    """
+    count = 0
+    for k in old.keys() | new.keys():
+        a, b = old.get(k, _MISSING), new.get(k, _MISSING)
+        if a is b or _is_lazy(a) or _is_lazy(b):
+            continue
+        a_tree = isinstance(a, Mapping) and len(a) > 0
+        b_tree = isinstance(b, Mapping) and len(b) > 0
+        if a_tree and b_tree:
+            count += count_changes(a, b)
+        elif a_tree:
+            count += sum(1 for _ in iter_leaves(a)) + (b is not _MISSING)
+        elif b_tree:
+            count += sum(1 for _ in iter_leaves(b)) + (a is not _MISSING)
+        elif a != b:
+            count += 1
+    return count
+
+
+def _is_lazy(value: Any) -> bool:
+    return type(value) is LazyDict and value.is_lazy
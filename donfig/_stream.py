@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Walking and writing configuration trees without copying them.
+
+This module should be considered private and should not be imported directly
+by users. Use :meth:`donfig.Config.iter_flat` and :meth:`donfig.Config.dump`
+instead.
+
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+
+import yaml
+
+from ._tree import copy_tree
+
+Spellings = Mapping[tuple[Any, ...], str]
+# yaml.resolver.Resolver.resolve: node class, node value and implicit flags to the resolved tag
+Resolve = Callable[[type[yaml.Node], Any, Any], str]
+
+
+def _items(
+    node: Mapping[Any, Any], path: tuple[Any, ...], spellings: Spellings | None
+) -> Iterator[tuple[Any, tuple[Any, ...], Any]]:
+    """Yield the original spelling, stored key path and value of every item of ``node``."""
+    for k, v in node.items():
+        p = path + (k,)
+        yield k if spellings is None else spellings.get(p, k), p, v
+
+
+def iter_flat(
+    node: Mapping[Any, Any], name: str, path: tuple[Any, ...], spellings: Spellings | None
+) -> Iterator[tuple[str, Any]]:
+    """Yield ``(dotted_key, value)`` for every leaf below ``node``, empty mappings included."""
+    for k, p, v in _items(node, path, spellings):
+        dotted = f"{name}.{k}" if name else str(k)
+        if isinstance(v, Mapping) and v:
+            yield from iter_flat(v, dotted, p, spellings)
+        else:
+            yield dotted, v
+
+
+def write_json(
+    value: Any,
+    write: Callable[[str], Any],
+    path: tuple[Any, ...] = (),
+    spellings: Spellings | None = None,
+    level: int = 0,
+    indent: str = "  ",
+) -> None:
+    """Write ``value`` as indented JSON, one mapping item or list element at a time."""
+    if isinstance(value, Mapping):
+        if not value:
+            write("{}")
+            return
+        inner = "\n" + indent * (level + 1)
+        separator = "{" + inner
+        for k, p, v in _items(value, path, spellings):
+            # same key conversion as json.dumps
+            write(separator + json.dumps(k if isinstance(k, str) else json.dumps(k)) + ": ")
+            write_json(v, write, p, spellings, level + 1, indent)
+            separator = "," + inner
+        write("\n" + indent * level + "}")
+    elif isinstance(value, (list, tuple)) and value:
+        inner = "\n" + indent * (level + 1)
+        separator = "[" + inner
+        for v in value:
+            write(separator)
+            write_json(v, write, (), None, level + 1, indent)
+            separator = "," + inner
+        write("\n" + indent * level + "]")
+    else:
+        write(json.dumps(value))
+
+
+def yaml_events(value: Any, spellings: Spellings | None = None, path: tuple[Any, ...] = ()) -> Iterator[yaml.Event]:
+    """Events of a YAML stream holding ``value`` as its only document, generated as they are emitted."""
+    representer = yaml.representer.SafeRepresenter(default_flow_style=False, sort_keys=False)
+    # untyped in the yaml stubs
+    resolve: Resolve = yaml.resolver.Resolver().resolve
+    yield yaml.StreamStartEvent()
+    yield yaml.DocumentStartEvent(explicit=False)
+    yield from _value_events(value, path, spellings, representer, resolve)
+    yield yaml.DocumentEndEvent(explicit=False)
+    yield yaml.StreamEndEvent()
+
+
+def _value_events(
+    value: Any,
+    path: tuple[Any, ...],
+    spellings: Spellings | None,
+    representer: yaml.representer.SafeRepresenter,
+    resolve: Resolve,
+) -> Iterator[yaml.Event]:
+    if not isinstance(value, Mapping) or not value:
+        yield from _node_events(_represent(representer, value), resolve)
+        return
+    yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+    for k, p, v in _items(value, path, spellings):
+        yield from _node_events(_represent(representer, k), resolve)
+        yield from _value_events(v, p, spellings, representer, resolve)
+    yield yaml.MappingEndEvent()
+
+
+def _represent(representer: yaml.representer.SafeRepresenter, value: Any) -> yaml.Node:
+    # leaves are small, represent them one at a time without aliases between them
+    node = representer.represent_data(copy_tree(value, shallow_leaves=True))
+    representer.represented_objects = {}
+    representer.object_keeper = []
+    representer.alias_key = None
+    return node
+
+
+def _node_events(node: yaml.Node, resolve: Resolve) -> Iterator[yaml.Event]:
+    """Events for a represented node, as emitted by ``yaml.serializer.Serializer``."""
+    if isinstance(node, yaml.ScalarNode):
+        plain = node.tag == resolve(yaml.ScalarNode, node.value, (True, False))
+        quoted = node.tag == resolve(yaml.ScalarNode, node.value, (False, True))
+        yield yaml.ScalarEvent(None, node.tag, (plain, quoted), node.value, style=node.style)
+    elif isinstance(node, yaml.SequenceNode):
+        implicit = node.tag == resolve(yaml.SequenceNode, node.value, True)
+        yield yaml.SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for item in node.value:
+            yield from _node_events(item, resolve)
+        yield yaml.SequenceEndEvent()
+    elif isinstance(node, yaml.MappingNode):
+        implicit = node.tag == resolve(yaml.MappingNode, node.value, True)
+        yield yaml.MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for key, item in node.value:
+            yield from _node_events(key, resolve)
+            yield from _node_events(item, resolve)
+        yield yaml.MappingEndEvent()
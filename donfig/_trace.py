@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Startup tracing for configuration collection.
+
+This module should be considered private and should not be imported directly
+by users. Tracing is enabled per configuration object through the
+``<NAME>_TRACE`` environment variable, see :class:`donfig.Config`.
+
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import stat
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+logger = logging.getLogger("donfig.trace")
+
+_FLAG_VALUES = {"1", "true", "yes", "on", "log"}
+_OFF_VALUES = {"", "0", "false", "no", "off"}
+
+_active_trace: ContextVar[StartupTrace | None] = ContextVar("donfig_active_trace", default=None)
+
+
+def trace_target(value: str | None) -> str | None:
+    """Interpret the value of a ``<NAME>_TRACE`` environment variable.
+
+    Returns ``None`` when tracing is disabled, ``"log"`` when records should
+    go to the ``donfig.trace`` logger and a file path otherwise.
+
+    """
+    if value is None or value.strip().lower() in _OFF_VALUES:
+        return None
+    if value.strip().lower() in _FLAG_VALUES:
+        return "log"
+    return value
+
+
+def current_trace() -> StartupTrace | None:
+    """Get the trace collecting events for the current context, if any."""
+    return _active_trace.get()
+
+
+class StartupTrace:
+    """Structured breakdown of one configuration collection.
+
+    Events are recorded by the collection functions while the trace is
+    active (see :meth:`activate`) and written out as a single JSON record by
+    :meth:`emit`.
+
+    """
+
+    def __init__(self, name: str, event: str) -> None:
+        self.name = name
+        self.event = event
+        self.paths: list[dict[str, Any]] = []
+        self.files: list[dict[str, Any]] = []
+        self.env: dict[str, Any] = {"considered": 0, "matched": []}
+        self.merge_seconds = 0.0
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def activate(self) -> Iterator[StartupTrace]:
+        token = _active_trace.set(self)
+        try:
+            yield self
+        finally:
+            _active_trace.reset(token)
+
+    def add_path(self, path: str, status: str) -> None:
+        self.paths.append({"path": path, "status": status})
+
+    def add_file(self, path: str, size: int | None, seconds: float, cached: bool = False) -> None:
+        self.files.append({"path": path, "size": size, "seconds": seconds, "cached": cached})
+
+    def add_env(self, considered: int, matched: list[str]) -> None:
+        self.env["considered"] += considered
+        self.env["matched"].extend(matched)
+
+    def add_merge(self, seconds: float) -> None:
+        self.merge_seconds += seconds
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "event": self.event,
+            "pid": os.getpid(),
+            "timestamp": time.time(),
+            "total_seconds": time.perf_counter() - self._start,
+            "paths": self.paths,
+            "files": self.files,
+            "env": self.env,
+            "merge_seconds": self.merge_seconds,
+        }
+
+    def emit(self, target: str) -> None:
+        """Write the trace record to the logger or append it to a JSON lines file."""
+        record = json.dumps(self.to_dict())
+        if target == "log":
+            logger.info(record)
+            return
+        try:
+            with open(target, "a") as f:
+                f.write(record + "\n")
+        except OSError as exc:
+            logger.warning("Could not write donfig trace to %r: %s", target, exc)
+
+
+def probe_path(path: str) -> str:
+    """Classify a search path for tracing purposes."""
+    try:
+        st = os.stat(path)
+    except PermissionError:
+        return "permission denied"
+    except OSError:
+        return "not found"
+    if not stat.S_ISDIR(st.st_mode):
+        return "file"
+    if not os.access(path, os.R_OK | os.X_OK):
+        return "permission denied"
+    return "directory"
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Helpers for walking nested configuration mappings.
+
+This module should be considered private and should not be imported directly
+by users.
+
+"""
+
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterator, Mapping
+from copy import deepcopy
+from typing import Any
+
+from ._lazy import LazyDict
+from ._persistent import PersistentMap
+
+# Immutable types that never need to be copied
+_ATOMIC = frozenset({str, int, float, bool, complex, bytes, type(None)})
+
+
+def normalize_key(key: str) -> str:
+    """Normalize a (dotted) key so hyphen and underscore spellings compare equal."""
+    return key.replace("_", "-")
+
+
+def normalize_path(path: tuple[Any, ...]) -> tuple[Any, ...]:
+    """Normalize every string key of a key path, see :func:`normalize_key`."""
+    return tuple(normalize_key(k) if isinstance(k, str) else k for k in path)
+
+
+def paths_overlap(a: tuple[Any, ...], b: tuple[Any, ...]) -> bool:
+    """Whether one of two normalized key paths contains the other."""
+    n = min(len(a), len(b))
+    return a[:n] == b[:n]
+
+
+def iter_leaves(tree: Mapping[str, Any], path: tuple[str, ...] = ()) -> Iterator[tuple[tuple[str, ...], Any]]:
+    """Walk a nested mapping yielding ``(path, value)`` for every leaf.
+
+    Empty mappings are yielded as leaves so that no key is lost.
+
+    """
+    for k, v in tree.items():
+        p = path + (k,)
+        if isinstance(v, Mapping) and v:
+            yield from iter_leaves(v, p)
+        else:
+            yield p, v
+
+
+def normalize_tree(
+    tree: Mapping[Any, Any], spellings: dict[tuple[Any, ...], Any], path: tuple[Any, ...] = ()
+) -> dict[Any, Any]:
+    """Copy the mappings of a nested tree using normalized keys.
+
+    The first spelling seen for every normalized path is stored in
+    ``spellings``. Leaf values are not copied. Keys that are not strings, as
+    YAML allows, are kept as is.
+
+    """
+    result: dict[Any, Any] = {}
+    for k, v in tree.items():
+        nk = normalize_key(k) if isinstance(k, str) else k
+        p = path + (nk,)
+        spellings.setdefault(p, k)
+        result[nk] = normalize_tree(v, spellings, p) if isinstance(v, Mapping) else v
+    return result
+
+
+def restore_spellings(
+    tree: Mapping[str, Any], spellings: Mapping[tuple[str, ...], str], path: tuple[str, ...] = ()
+) -> dict[str, Any]:
+    """Inverse of :func:`normalize_tree`, copying mappings with the original spellings."""
+    result: dict[str, Any] = {}
+    for k, v in tree.items():
+        p = path + (k,)
+        key = spellings.get(p, k)
+        result[key] = restore_spellings(v, spellings, p) if isinstance(v, Mapping) else v
+    return result
+
+
+def dedupe_leaves(value: Any, memo: dict[Any, Any]) -> Any:
+    """Copy the mappings and lists of a tree sharing one object per distinct immutable leaf value.
+
+    ``memo`` holds the leaves seen so far and can be shared between trees.
+    Lazily loaded sections that were not accessed yet are kept as is.
+
+    """
+    cls = type(value)
+    if cls is str or cls is int or cls is bytes or cls is complex:
+        return memo.setdefault((cls, value), value)
+    if cls is float:
+        # 0.0 == -0.0, the hexadecimal representation tells them apart
+        return memo.setdefault((cls, value.hex()), value)
+    if cls is dict:
+        return {k: dedupe_leaves(v, memo) for k, v in value.items()}
+    if cls is PersistentMap:
+        new = PersistentMap.__new__(PersistentMap)
+        dict.update(new, ((k, dedupe_leaves(v, memo)) for k, v in value.items()))
+        return new
+    if cls is list:
+        return [dedupe_leaves(v, memo) for v in value]
+    if cls is tuple:
+        return tuple([dedupe_leaves(v, memo) for v in value])
+    return value
+
+
+def tree_size(value: Any, seen: set[int]) -> int:
+    """Approximate number of bytes used by a tree, not counting objects whose id is in ``seen``.
+
+    The ids of all counted objects are added to ``seen``. Lazily loaded
+    sections that were not accessed yet only count as an empty dictionary.
+
+    """
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if type(value) is LazyDict and value.is_lazy:
+        return size
+    if isinstance(value, Mapping):
+        for k, v in value.items():
+            size += tree_size(k, seen) + tree_size(v, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += tree_size(v, seen)
+    return size
+
+
+def copy_tree(obj: Any, shallow_leaves: bool = False) -> Any:
+    """Copy a configuration tree of plain data.
+
+    This is a specialized, much faster replacement of ``copy.deepcopy`` for
+    the dictionaries, lists, tuples, strings and numbers configuration is
+    usually made of. Persistent and lazy mappings are copied to plain
+    dictionaries.
+    Any other object is copied with ``copy.deepcopy``, or returned as is if
+    ``shallow_leaves`` is True. Objects referenced more than once in ``obj``
+    become independent copies.
+
+    """
+    try:
+        return _copy(obj, shallow_leaves)
+    except RecursionError:
+        # self-referencing data, only deepcopy handles that
+        return deepcopy(obj)
+
+
+def _copy(obj: Any, shallow_leaves: bool) -> Any:
+    cls = type(obj)
+    if cls in _ATOMIC:
+        return obj
+    # atomic values are checked inline to save a function call per leaf
+    if cls is dict or cls is PersistentMap or cls is LazyDict:
+        return {k: v if type(v) in _ATOMIC else _copy(v, shallow_leaves) for k, v in obj.items()}
+    if cls is list:
+        return [v if type(v) in _ATOMIC else _copy(v, shallow_leaves) for v in obj]
+    if cls is tuple:
+        return tuple([v if type(v) in _ATOMIC else _copy(v, shallow_leaves) for v in obj])
+    return obj if shallow_leaves else deepcopy(obj)
@@ -4,25 +4,73 @@
 from __future__ import annotations
 
 import ast
+import asyncio
 import base64
 import contextlib
+import contextvars
+import functools
 import json
 import os
 import pprint
+import re
+import signal
 import site
 import sys
+import threading
+import time
 import warnings
-from collections.abc import Mapping, MutableMapping, Sequence
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping, MutableMapping, Sequence
 from contextlib import nullcontext
-from copy import deepcopy
 from types import TracebackType
-from typing import Any, Literal
+from typing import IO, TYPE_CHECKING, Any, Literal, NamedTuple, SupportsIndex
 
 import yaml
 
+from ._access import AccessRecorder
+from ._cache import copy_parsed, decode_inherited, file_key, find_config_files, forget_path, lookup_parsed, store_parsed
+from ._fingerprint import DigestCache, leaf_digest
+from ._lazy import LazyDict, load_yaml, load_yaml_lazy
 from ._lock import SerializableLock
+from ._memo import ConfigListener, DerivedValue, Memoized, P, R
+from ._persistent import PersistentMap, freeze
+from ._reload import SignalReloader
+from ._stream import iter_flat as _iter_flat
+from ._stream import write_json, yaml_events
+from ._trace import StartupTrace, current_trace, probe_path, trace_target
+from ._tree import (
+    copy_tree,
+    dedupe_leaves,
+    iter_leaves,
+    normalize_key,
+    normalize_path,
+    normalize_tree,
+    paths_overlap,
+    restore_spellings,
+    tree_size,
+)
+
+if TYPE_CHECKING:
+    from .sources import ConfigSource
 
 no_default = "__no_default__"
+_MISSING = object()
+
+# every configuration object of this process, to find defaults when unpickling compact configurations
+_instances: weakref.WeakSet[Config] = weakref.WeakSet()
+
+# number of configuration snapshots kept for :meth:`Config.delta_since`
+_SHIPPED_SNAPSHOTS = 8
+
+
+class ConfigDelta(NamedTuple):
+    """Changes of a configuration between two generations, see :meth:`Config.delta_since`."""
+
+    base: int
+    generation: int
+    set: list[tuple[tuple[str, ...], Any]]
+    unset: list[tuple[str, ...]]
 
 
 def canonical_name(k: str, config: Mapping[str, Any]) -> str:
@@ -58,7 +106,9 @@ def update(
 
     This is like dict.update except that it smoothly merges nested values
 
-    This operates in-place and modifies old
+    This operates in-place and modifies old. If ``old`` is an immutable
+    persistent mapping (see ``Config(..., persistent=True)``) a new persistent
+    mapping is returned instead, reusing all subtrees not touched by ``new``.
 
     Parameters
     ----------
@@ -92,11 +142,18 @@ def update(
     donfig.config_obj.merge
 
     """
+    if isinstance(old, PersistentMap):
+        return _update_persistent(old, new, priority, defaults)
+
     for k, v in new.items():
         k = canonical_name(k, old)
 
         if isinstance(v, Mapping):
             if k not in old or old[k] is None:
+                if type(v) is LazyDict and v.is_lazy:
+                    # nothing to merge with, keep the section unconstructed
+                    old[k] = v.clone()
+                    continue
                 old[k] = {}
             update(
                 old[k],
@@ -115,6 +172,42 @@ def update(
     return old
 
 
+def _update_persistent(
+    old: PersistentMap,
+    new: Mapping[str, Any],
+    priority: Literal["old", "new", "new-defaults"],
+    defaults: Mapping[str, Any] | None,
+) -> PersistentMap:
+    changes: dict[str, Any] = {}
+    for k, v in new.items():
+        k = canonical_name(k, old)
+
+        if isinstance(v, Mapping):
+            current = changes.get(k, old.get(k))
+            if not isinstance(current, PersistentMap):
+                current = PersistentMap(current or {})
+            child = _update_persistent(
+                current,
+                v,
+                priority=priority,
+                defaults=defaults.get(k) if defaults else None,
+            )
+            if child is not current or current is not old.get(k):
+                # unchanged subtrees are shared, not copied
+                changes[k] = child
+        else:
+            if k in old and old[k] is v:
+                continue
+            if (
+                priority == "new"
+                or k not in old
+                or (priority == "new-defaults" and defaults and k in defaults and defaults[k] == old[k])
+            ):
+                changes[k] = v
+
+    return old.set_many(changes)
+
+
 def merge(*dicts: Mapping[str, Any]) -> dict[str, Any]:
     """Update a sequence of nested dictionaries
 
@@ -133,54 +226,65 @@ def merge(*dicts: Mapping[str, Any]) -> dict[str, Any]:
 
     """
     result: dict[str, Any] = {}
+    if dicts and isinstance(dicts[0], PersistentMap):
+        # immutable, so it can be used as the starting point without copying
+        result, dicts = dicts[0], dicts[1:]
     for d in dicts:
-        update(result, d)
+        result = update(result, d)
     return result
 
 
-def collect_yaml(paths: Sequence[str]) -> list[dict[str, Any]]:
+def collect_yaml(paths: Sequence[str], lazy: bool = False) -> list[dict[str, Any]]:
     """Collect configuration from yaml files
 
     This searches through a list of paths, expands to find all yaml or json
-    files, and then parses each file.
+    files, and then parses each file. Directory listings and missing paths
+    are cached for the whole process, see :func:`donfig.clear_caches`.
+
+    If ``lazy`` is True, top level sections that are mappings are only
+    constructed when they are first accessed. Merged results are the same as
+    when loading eagerly.
 
     """
+    trace = current_trace()
+
     # Find all paths
     file_paths = []
     for path in paths:
-        if os.path.exists(path):
-            if os.path.isdir(path):
-                try:
-                    file_paths.extend(
-                        sorted(
-                            os.path.join(path, p)
-                            for p in os.listdir(path)
-                            if os.path.splitext(p)[1].lower() in (".json", ".yaml", ".yml")
-                        )
-                    )
-                except OSError:
-                    # Ignore permission errors
-                    pass
-            else:
-                file_paths.append(path)
+        if trace is not None:
+            trace.add_path(path, probe_path(path))
+        file_paths.extend(find_config_files(path))
 
     configs = []
 
     # Parse yaml files
     for path in file_paths:
-        config = _load_config_file(path)
+        config = _load_config_file(path, lazy=lazy)
         if config is not None:
             configs.append(config)
 
     return configs
 
 
-def _load_config_file(path: str) -> dict[str, Any] | None:
+def _load_config_file(path: str, lazy: bool = False) -> dict[str, Any] | None:
+    trace = current_trace()
+    start = time.perf_counter()
+    config: dict[str, Any] | None
     try:
         with open(path) as f:
-            config = yaml.safe_load(f.read())
+            st = os.fstat(f.fileno())
+            key = file_key(st, lazy)
+            cached, config = lookup_parsed(key)
+            if cached:
+                if trace is not None:
+                    trace.add_file(path, st.st_size, time.perf_counter() - start, cached=True)
+                return config
+            text = f.read()
+            config = load_yaml_lazy(text, path) if lazy else load_yaml(text)
     except OSError:
         # Ignore permission errors
+        if trace is not None:
+            trace.add_path(path, "permission denied")
         return None
     except Exception as exc:
         raise ValueError(f"A config file at {path!r} is malformed, original error message:\n\n{exc}") from None
@@ -189,6 +293,13 @@ def _load_config_file(path: str) -> dict[str, Any] | None:
             f"A config file at {path!r} is malformed - config files must have "
             f"a dict as the top level object, got a {type(config).__name__} instead"
         )
+    stored = store_parsed(key, config)
+    if trace is not None:
+        trace.add_file(path, st.st_size, time.perf_counter() - start)
+    if stored:
+        # the cached tree is shared with later loads
+        result: dict[str, Any] | None = copy_parsed(config)
+        return result
     return config
 
 
@@ -209,20 +320,26 @@ def collect_env(
     if env is None:
         env = os.environ
 
-    serial_env = f"{prefix}_INTERNAL_INHERIT_CONFIG"
+    serial_env = _inherit_env_var(prefix)
     if serial_env in env:
-        d = deserialize(env[serial_env])
+        d = decode_inherited(env[serial_env], deserialize)
     else:
         d = {}
 
+    trace = current_trace()
+    matched = []
     prefix_len = len(prefix)
     for name, value in env.items():
         if name.startswith(prefix):
+            if trace is not None:
+                matched.append(name)
             varname = name[prefix_len:].lower().replace("__", ".")
             try:
                 d[varname] = ast.literal_eval(value)
             except (SyntaxError, ValueError):
                 d[varname] = value
+    if trace is not None:
+        trace.add_env(len(env), matched)
 
     result: dict[str, Any] = {}
     # fake thread lock to use set functionality
@@ -231,11 +348,25 @@ def collect_env(
     return result
 
 
+def _check_deprecations(key: str, deprecations: Mapping[str, str | None]) -> str:
+    if key in deprecations:
+        new = deprecations[key]
+        if new:
+            warnings.warn(f"Configuration key {key!r} has been deprecated. Please use {new!r} instead", stacklevel=3)
+            return new
+        else:
+            raise ValueError(f"Configuration value {key!r} has been removed")
+    else:
+        return key
+
+
 class ConfigSet:
     """Temporarily set configuration values within a context manager
 
     Note, this class should be used directly from the `Config`
-    object via the :meth:`donfig.Config.set` method.
+    object via the :meth:`donfig.Config.set` method. Refreshing a `Config`
+    replaces its dictionary, a ``ConfigSet`` created directly on an earlier
+    ``config.config`` keeps modifying that old dictionary.
 
     Examples
     --------
@@ -251,6 +382,8 @@ class ConfigSet:
 
     """
 
+    __slots__ = ("config", "lock", "deprecations", "_record")
+
     def __init__(
         self,
         config: MutableMapping[str, Any],
@@ -261,6 +394,7 @@ class ConfigSet:
     ) -> None:
         with lock:
             self.config = config
+            self.lock = lock
             self.deprecations = deprecations
             self._record: list[tuple[Literal["replace", "insert"], tuple[str, ...], Any]] = []
 
@@ -289,17 +423,7 @@ class ConfigSet:
             value
 
         """
-        if key in self.deprecations:
-            new = self.deprecations[key]
-            if new:
-                warnings.warn(
-                    f"Configuration key {key!r} has been deprecated. Please use {new!r} instead", stacklevel=2
-                )
-                return new
-            else:
-                raise ValueError(f"Configuration value {key!r} has been removed")
-        else:
-            return key
+        return _check_deprecations(key, self.deprecations)
 
     def __enter__(self) -> MutableMapping[str, Any]:
         return self.config
@@ -310,20 +434,8 @@ class ConfigSet:
         exc_value: BaseException | None,
         exc_tb: TracebackType | None,
     ) -> None:
-        for op, path, value in reversed(self._record):
-            d = self.config
-            if op == "replace":
-                for key in path[:-1]:
-                    d = d.setdefault(key, {})
-                d[path[-1]] = value
-            else:  # insert
-                for key in path[:-1]:
-                    try:
-                        d = d[key]
-                    except KeyError:
-                        break
-                else:
-                    d.pop(path[-1], None)
+        with self.lock:
+            _rollback(self.config, self._record)
 
     def _assign(
         self,
@@ -349,7 +461,7 @@ class ConfigSet:
             Whether this operation needs to be recorded to allow for rollback.
 
         """
-        key = canonical_name(keys[0], d)
+        key = self._canonical_name(keys[0], d)
         path = path + (key,)
 
         if len(keys) == 1:
@@ -368,6 +480,379 @@ class ConfigSet:
                 record = False
             self._assign(keys[1:], value, d[key], path, record=record)
 
+    def _canonical_name(self, k: str, d: Mapping[str, Any]) -> str:
+        return canonical_name(k, d)
+
+
+class _OwnedConfigSet(ConfigSet):
+    """ConfigSet bound to the :class:`Config` object it modifies.
+
+    This handles the optional storage modes of the configuration object. With
+    normalized keys, keys are normalized once before assignment so no
+    hyphen/underscore alternatives have to be probed, and their original
+    spelling is recorded. With persistent storage, assignments and rollbacks
+    path-copy the persistent tree and publish the new root on the owner.
+
+    """
+
+    __slots__ = ("owner", "_spelled")
+
+    def __init__(self, owner: Config, /, arg: Mapping[str, Any] | None = None, **kwargs: Any) -> None:
+        self.owner = owner
+        # normalized paths whose spelling was first recorded by this set
+        self._spelled: list[tuple[str, ...]] = []
+        # resolve deprecated keys once, the lock needs the paths before anything is assigned
+        items = {_check_deprecations(key, owner.deprecations): value for key, value in (arg or {}).items()}
+        for key, value in kwargs.items():
+            items[_check_deprecations(key.replace("__", "."), owner.deprecations)] = value
+        paths = [key.split(".") for key in items]
+        with owner._locked(paths):
+            # a refresh this set waited for replaced the root, read it only once the lock is held
+            super().__init__(owner.config, contextlib.nullcontext(), {}, items)
+        owner._changed([path for _, path, _ in self._record])
+
+    def __enter__(self) -> MutableMapping[str, Any]:
+        return self.owner.config
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        owner = self.owner
+        with owner._locked(path for _, path, _ in self._record):
+            root = owner.config
+            if isinstance(root, PersistentMap):
+                owner.config = root = _rollback_persistent(root, self._record)
+            else:
+                _rollback(root, self._record)
+            # forget the spellings of keys that only existed while this set was active
+            _prune_spellings(owner._spellings, root, self._spelled)
+        owner._changed([path for _, path, _ in self._record], rollback=True)
+
+    def _assign(
+        self,
+        keys: Sequence[str],
+        value: Any,
+        d: MutableMapping[str, Any],
+        path: tuple[str, ...] = (),
+        record: bool = True,
+    ) -> None:
+        owner = self.owner
+        if not path and owner.normalize_keys:
+            normalized = [normalize_key(k) for k in keys]
+            spellings = {tuple(normalized[: i + 1]): k for i, k in enumerate(keys)}
+            if isinstance(value, Mapping):
+                value = normalize_tree(value, spellings, tuple(normalized))
+            for p, k in spellings.items():
+                if p not in owner._spellings:
+                    owner._spellings[p] = k
+                    self._spelled.append(p)
+            keys = normalized
+        if isinstance(owner.config, PersistentMap):
+            self._assign_persistent(owner.config, keys, value)
+        else:
+            super()._assign(keys, value, d, path, record)
+
+    def _assign_persistent(self, root: PersistentMap, keys: Sequence[str], value: Any) -> None:
+        node: Any = root
+        path: list[str] = []
+        for i, k in enumerate(keys):
+            if not isinstance(node, Mapping):
+                # an intermediate value that is not a mapping is replaced as a whole
+                self._record.append(("replace", tuple(path), node))
+                path.extend(keys[i:])
+                break
+            key = self._canonical_name(k, node)
+            path.append(key)
+            if key not in node:
+                # No need to record the levels below an insert
+                self._record.append(("insert", tuple(path), None))
+                path.extend(keys[i + 1 :])
+                break
+            node = node[key]
+        else:
+            self._record.append(("replace", tuple(path), node))
+        self.owner.config = root.set_in(path, value)
+
+    def _canonical_name(self, k: str, d: Mapping[str, Any]) -> str:
+        if self.owner.normalize_keys:
+            return k
+        return canonical_name(k, d)
+
+
+class ConfigPatch:
+    """Reusable set of configuration values to apply within a context manager
+
+    Note, this class should be created from the `Config` object via the
+    :meth:`donfig.Config.prepare_set` method.
+
+    Keys are split, checked against deprecations and normalized once when the
+    patch is created. The hyphen/underscore spelling used by the configuration
+    is remembered after the first use. Entering the patch then only swaps the
+    values in, and exiting rolls them back. A patch can be entered any number
+    of times, including nested and from several threads or asyncio tasks at
+    once, every exit rolls back the entry of its own thread or task.
+
+    Examples
+    --------
+    >>> from donfig import Config
+    >>> config = Config('mypkg')
+    >>> patch = config.prepare_set({'foo.bar': 123})
+    >>> for _ in range(3):
+    ...     with patch:
+    ...         pass
+
+    See Also
+    --------
+    donfig.Config.prepare_set
+    donfig.Config.set
+
+    """
+
+    def __init__(self, owner: Config, /, arg: Mapping[str, Any] | None = None, **kwargs: Any) -> None:
+        self.owner = owner
+        self._items: list[tuple[list[str], Any]] = []
+        # original spellings of the normalized paths, registered on the owner while the patch is active
+        self._spellings: dict[tuple[str, ...], str] = {}
+        # rollback records and newly registered spellings of the active entries, per thread and asyncio task
+        self._undo: contextvars.ContextVar[
+            tuple[tuple[list[tuple[Literal["replace", "insert"], tuple[str, ...], Any]], list[tuple[str, ...]]], ...]
+        ]
+        self._undo = contextvars.ContextVar(f"donfig_patch_undo_{id(self)}", default=())
+
+        items = list(arg.items()) if arg is not None else []
+        items.extend((key.replace("__", "."), value) for key, value in kwargs.items())
+        for key, value in items:
+            keys = _check_deprecations(key, owner.deprecations).split(".")
+            if owner.normalize_keys:
+                normalized = [normalize_key(k) for k in keys]
+                for i, k in enumerate(keys):
+                    self._spellings.setdefault(tuple(normalized[: i + 1]), k)
+                if isinstance(value, Mapping):
+                    value = normalize_tree(value, self._spellings, tuple(normalized))
+                keys = normalized
+            self._items.append((keys, value))
+
+    def __enter__(self) -> MutableMapping[str, Any]:
+        owner = self.owner
+        normalized = owner.normalize_keys
+        record: list[tuple[Literal["replace", "insert"], tuple[str, ...], Any]] = []
+        spelled: list[tuple[str, ...]] = []
+        with owner._locked(keys for keys, _ in self._items):
+            root = owner.config
+            # a refresh may have replaced the spellings since the last entry
+            for path, spelling in self._spellings.items():
+                if path not in owner._spellings:
+                    owner._spellings[path] = spelling
+                    spelled.append(path)
+            for keys, value in self._items:
+                node: Any = root
+                parent: Any = None
+                for i, k in enumerate(keys):
+                    if type(node) is not dict and not isinstance(node, Mapping):
+                        # an intermediate value that is not a mapping is replaced as a whole
+                        record.append(("replace", tuple(keys[:i]), node))
+                        break
+                    if k not in node:
+                        if not normalized:
+                            # remember the spelling used by the configuration for next time
+                            k = keys[i] = canonical_name(k, node)
+                        if k not in node:
+                            record.append(("insert", tuple(keys[: i + 1]), None))
+                            break
+                    parent, node = node, node[k]
+                else:
+                    record.append(("replace", tuple(keys), node))
+                    if type(parent) is dict:
+                        # common case of replacing an existing value, no need to walk again
+                        parent[keys[-1]] = value
+                        continue
+                if isinstance(root, PersistentMap):
+                    root = root.set_in(keys, value)
+                else:
+                    _set_in(root, keys, value)
+            owner.config = root
+            owner._changed([path for _, path, _ in record])
+        self._undo.set(self._undo.get() + ((record, spelled),))
+        return root
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        undo = self._undo.get()
+        if not undo:
+            raise RuntimeError("The patch was not entered in this thread or asyncio task")
+        self._undo.set(undo[:-1])
+        record, spelled = undo[-1]
+        owner = self.owner
+        with owner._locked(path for _, path, _ in record):
+            if isinstance(owner.config, PersistentMap):
+                owner.config = _rollback_persistent(owner.config, record)
+            else:
+                _rollback(owner.config, record)
+            _prune_spellings(owner._spellings, owner.config, spelled)
+            owner._changed([path for _, path, _ in record], rollback=True)
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _inherit_env_var(prefix: str) -> str:
+    """Environment variable passing a serialized configuration to child processes."""
+    return f"{prefix}_INTERNAL_INHERIT_CONFIG"
+
+
+def _install_config(name: str, env_prefix: str, payload: str, generation: int) -> None:
+    """Install a configuration serialized by :meth:`Config.as_initargs` in this process."""
+    os.environ[_inherit_env_var(env_prefix)] = payload
+    inherited = None
+    for config in list(_instances):
+        if config.name == name and config.env_prefix == env_prefix:
+            if inherited is None:
+                inherited = deserialize(payload)
+            config.update(inherited)
+
+
+def _unpickle_compact(state: dict[str, Any]) -> Config:
+    """Rebuild a configuration pickled with ``pickle_mode="compact"``.
+
+    The defaults are taken from a configuration of the same name and with the
+    same defaults in this process, the files are read again and only the
+    values changed since the last refresh on the sending side are applied.
+
+    """
+    defaults: list[Mapping[str, Any]] = []
+    if state["defaults"] != leaf_digest(defaults):
+        for other in list(_instances):
+            if other.name == state["name"] and leaf_digest(other.defaults) == state["defaults"]:
+                defaults = other.defaults
+                break
+        else:
+            raise ValueError(
+                f"Can not unpickle the {state['name']!r} configuration: no configuration with the same defaults "
+                "exists in this process. Import the package defining it first or use pickle_mode='full'."
+            )
+    config = Config(
+        state["name"],
+        defaults=defaults,
+        paths=state["paths"],
+        env=state["env"],
+        env_var="",  # the paths are already complete
+        env_prefix=state["env_prefix"],
+        deprecations=state["deprecations"],
+        normalize_keys=state["normalize_keys"],
+        persistent=state["persistent"],
+        lazy_load=state["lazy_load"],
+        sources=state["sources"],
+        pickle_mode="compact",
+    )
+    config.main_path = state["main_path"]
+    config.trace_target = state["trace_target"]
+    config._spellings.update(state["spellings"])
+    if "config" in state:
+        config._publish(state["config"], config._spellings)
+        config._overrides = None
+    else:
+        root = config.config
+        for path in state["unset"]:
+            if isinstance(root, PersistentMap):
+                root = root.delete_in(path)
+            else:
+                _delete_in(root, path)
+        for path, value in state["set"]:
+            if isinstance(root, PersistentMap):
+                root = root.set_in(path, value)
+            else:
+                _set_in(root, path, value)
+        config.config = root
+        config._changed([*state["unset"], *(path for path, _ in state["set"])])
+    if state["lazy_env"]:
+        config.expand_environment_variables(lazy=True)
+    for key, func, depends_on in state["derived"]:
+        config.derive(key, func, depends_on)
+    if state["fingerprint"] is not None and config.fingerprint() != state["fingerprint"]:
+        raise ValueError(
+            f"Can not unpickle the {state['name']!r} configuration: the configuration files or sources differ "
+            "in this process. Use pickle_mode='full' to send the whole configuration."
+        )
+    return config
+
+
+def _get_in(d: Mapping[str, Any], keys: Sequence[str]) -> Any:
+    for key in keys:
+        d = d[key]
+    return d
+
+
+def _get_canonical(d: Mapping[str, Any], keys: Sequence[str]) -> Any:
+    """Like :func:`_get_in` for keys in either hyphen or underscore spelling."""
+    for key in keys:
+        d = d[canonical_name(key, d)]
+    return d
+
+
+def _delete_in(d: MutableMapping[str, Any], keys: Sequence[str]) -> None:
+    for key in keys[:-1]:
+        child = d.get(key)
+        if not isinstance(child, MutableMapping):
+            return
+        d = child
+    d.pop(keys[-1], None)
+
+
+def _set_in(d: MutableMapping[str, Any], keys: Sequence[str], value: Any) -> None:
+    for key in keys[:-1]:
+        child = d.get(key)
+        if type(child) is not dict and not isinstance(child, MutableMapping):
+            child = d[key] = {}
+        d = child
+    d[keys[-1]] = value
+
+
+def _prune_spellings(
+    spellings: dict[tuple[str, ...], str], root: Mapping[str, Any], paths: Iterable[tuple[str, ...]]
+) -> None:
+    """Forget the spellings of the normalized ``paths`` that no longer exist in ``root``."""
+    for path in paths:
+        try:
+            _get_in(root, path)
+        except (KeyError, TypeError, IndexError):
+            spellings.pop(path, None)
+
+
+def _rollback(
+    config: MutableMapping[str, Any], record: Sequence[tuple[Literal["replace", "insert"], tuple[str, ...], Any]]
+) -> None:
+    for op, path, value in reversed(record):
+        d = config
+        if op == "replace":
+            for key in path[:-1]:
+                d = d.setdefault(key, {})
+            d[path[-1]] = value
+        else:  # insert
+            for key in path[:-1]:
+                try:
+                    d = d[key]
+                except KeyError:
+                    break
+            else:
+                d.pop(path[-1], None)
+
+
+def _rollback_persistent(
+    root: PersistentMap, record: Sequence[tuple[Literal["replace", "insert"], tuple[str, ...], Any]]
+) -> PersistentMap:
+    for op, path, value in reversed(record):
+        root = root.set_in(path, value) if op == "replace" else root.delete_in(path)
+    return root
+
 
 def expand_environment_variables(config: Any) -> Any:
     """Expand environment variables in a nested config dictionary
@@ -400,6 +885,155 @@ def expand_environment_variables(config: Any) -> Any:
         return config
 
 
+class _LazyEnvExpander:
+    """Expand environment variables in configuration values when they are read.
+
+    The variable names referenced by every template string are parsed once
+    and the expanded value is cached until one of those variables changes.
+    The normalized paths of the mappings containing templates are recorded
+    when the configuration is scanned and updated for every change, so
+    reading a subtree without templates does not have to walk it.
+
+    """
+
+    _pattern = re.compile(r"\$(\w+)|\$\{([^}]*)\}" + (r"|%([^%]*)%" if os.name == "nt" else ""))
+
+    # Maximum number of expanded template strings kept
+    maxsize = 1024
+
+    def __init__(self) -> None:
+        self._cache: OrderedDict[str, tuple[tuple[str, ...], tuple[str | None, ...], str]] = OrderedDict()
+        self._templates: set[tuple[str, ...]] = set()
+        # lazily loaded sections that could not be scanned yet, replaced as a whole when it changes
+        self._unscanned: frozenset[tuple[str, ...]] = frozenset()
+
+    def scan(self, config: Any) -> None:
+        """Find and parse all template strings in ``config`` ahead of time."""
+        self._cache.clear()
+        self._templates = set()
+        self._unscanned = frozenset()
+        self._scan(config, ())
+
+    def changed(self, config: Any, paths: Iterable[tuple[str, ...]] | None) -> None:
+        """Scan the values at the normalized key ``paths`` of ``config`` again, everything if None."""
+        if paths is None:
+            self.scan(config)
+            return
+        for path in paths:
+            try:
+                value = _get_canonical(config, path)
+            except (KeyError, TypeError, IndexError):
+                continue
+            self._scan_at(value, path)
+
+    def _scan_at(self, value: Any, path: tuple[str, ...]) -> None:
+        if self._scan(value, path):
+            # the mappings above contain the template too
+            self._templates.update(path[:i] for i in range(1, len(path)))
+
+    def _scan(self, value: Any, path: tuple[str, ...]) -> bool:
+        """Record the templates below ``value`` and return whether there are any."""
+        if type(value) is LazyDict and value.is_lazy:
+            # scanned on first use instead
+            self._unscanned |= {path}
+            return False
+        if isinstance(value, str):
+            if self._is_template(value):
+                self.expand_str(value)
+                return True
+            return False
+        if isinstance(value, Mapping):
+            found = False
+            for k, v in value.items():
+                found = self._scan(v, path + (normalize_key(k) if isinstance(k, str) else k,)) or found
+        elif isinstance(value, (list, tuple, set)):
+            found = False
+            for v in value:
+                found = self._scan(v, path) or found
+        else:
+            return False
+        if found:
+            self._templates.add(path)
+        return found
+
+    @staticmethod
+    def _is_template(value: str) -> bool:
+        return "$" in value or (os.name == "nt" and "%" in value)
+
+    def expand_str(self, template: str) -> str:
+        cache = self._cache
+        cached = cache.get(template)
+        environ = os.environ
+        if cached is not None:
+            names, values, expanded = cached
+            if all(environ.get(n) == v for n, v in zip(names, values, strict=True)):
+                with contextlib.suppress(KeyError):  # evicted concurrently
+                    cache.move_to_end(template)
+                return expanded
+        names = tuple(next(g for g in m.groups() if g is not None) for m in self._pattern.finditer(template))
+        expanded = os.path.expandvars(template)
+        cache[template] = (names, tuple(environ.get(n) for n in names), expanded)
+        while len(cache) > self.maxsize:
+            with contextlib.suppress(KeyError):  # evicted concurrently
+                cache.popitem(last=False)
+        return expanded
+
+    def expand(self, value: Any, path: tuple[str, ...], config: Any) -> Any:
+        """Return ``value`` found at the normalized key ``path`` of ``config`` with environment variables expanded.
+
+        Values without templates are returned as is, without copying.
+
+        """
+        if isinstance(value, str):
+            return self.expand_str(value) if self._is_template(value) else value
+        if not isinstance(value, (Mapping, list, tuple, set)):
+            return value
+        if self._unscanned and any(paths_overlap(path, p) for p in self._unscanned):
+            self._scan_loaded(config)
+            if any(paths_overlap(path, p) for p in self._unscanned):
+                # contains a section that is still lazy
+                return self._expand_any(value)
+        if path not in self._templates:
+            return value
+        if isinstance(value, Mapping):
+            return {
+                k: self.expand(v, path + (normalize_key(k) if isinstance(k, str) else k,), config)
+                for k, v in value.items()
+            }
+        return self._expand_any(value)
+
+    def _scan_loaded(self, config: Any) -> None:
+        """Scan the lazily loaded sections that were loaded since they were skipped."""
+        for path in self._unscanned:
+            try:
+                value = _get_canonical(config, path)
+            except (KeyError, TypeError, IndexError):
+                value = None
+            if type(value) is LazyDict and value.is_lazy:
+                continue
+            self._unscanned -= {path}
+            if value is not None:
+                self._scan_at(value, path)
+
+    def _expand_any(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.expand_str(value) if self._is_template(value) else value
+        if isinstance(value, (Mapping, list, tuple, set)) and self._has_template(value):
+            if isinstance(value, Mapping):
+                return {k: self._expand_any(v) for k, v in value.items()}
+            return type(value)([self._expand_any(v) for v in value])
+        return value
+
+    def _has_template(self, value: Any) -> bool:
+        if isinstance(value, str):
+            return self._is_template(value)
+        if isinstance(value, Mapping):
+            return any(self._has_template(v) for v in value.values())
+        if isinstance(value, (list, tuple, set)):
+            return any(self._has_template(v) for v in value)
+        return False
+
+
 class Config:
     def __init__(
         self,
@@ -411,6 +1045,14 @@ class Config:
         root_env_var: str | None = None,
         env_prefix: str | None = None,
         deprecations: Mapping[str, str | None] | None = None,
+        trace_env_var: str | None = None,
+        normalize_keys: bool = False,
+        persistent: bool = False,
+        lazy_load: bool = False,
+        sources: Sequence[ConfigSource] | None = None,
+        pickle_mode: Literal["full", "compact"] = "full",
+        lock_stripe_depth: int = 0,
+        dedupe_values: bool = False,
     ):
         if root_env_var is None:
             root_env_var = f"{name.upper()}_ROOT_CONFIG"
@@ -437,6 +1079,8 @@ class Config:
             main_path = os.path.join(os.path.expanduser("~"), ".config", name)
         if deprecations is None:
             deprecations = {}
+        if trace_env_var is None:
+            trace_env_var = f"{name.upper()}_TRACE"
 
         # Remove duplicate paths while preserving ordering
         paths = list(reversed(list(dict.fromkeys(reversed(paths)))))
@@ -448,10 +1092,167 @@ class Config:
         self.paths = paths
         self.defaults: list[Mapping[str, Any]] = list(defaults) if defaults is not None else []
         self.deprecations = deprecations
-
-        self.config: dict[str, Any] = {}
+        self.trace_target = trace_target(os.environ.get(trace_env_var))
+        self.normalize_keys = normalize_keys
+        self.lazy_load = lazy_load
+        self.sources: list[ConfigSource] = list(sources) if sources is not None else []
+        self.pickle_mode = pickle_mode
+        self.dedupe_values = dedupe_values
+        self._spellings: dict[tuple[str, ...], str] = {}
+
+        self.config: dict[str, Any] = PersistentMap() if persistent else {}
         self.config_lock = SerializableLock()
-        self.refresh()
+        self.lock_stripe_depth = lock_stripe_depth
+        self._stripes: dict[tuple[str, ...], SerializableLock] = {}
+        self._access_recorder: AccessRecorder | None = None
+        self._env_expander: _LazyEnvExpander | None = None
+        self._digests = DigestCache()
+        self._tracked_config: Mapping[str, Any] = self.config
+        self._listeners: weakref.WeakSet[ConfigListener] = weakref.WeakSet()
+        self._derived: dict[str, DerivedValue] = {}
+        self._refresh_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = []
+        # paths changed since the last refresh with the number of changes not rolled back yet,
+        # None if that is not known
+        self._overrides: dict[tuple[str, ...], int] | None = {}
+        self._generation = 0
+        # protects the bookkeeping of _changed, which runs outside of config_lock
+        self._changes_lock = threading.Lock()
+        self._shipped: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        self._last_delta: ConfigDelta | None = None
+        self._applied: tuple[int, int, dict[str, Any]] | None = None
+        self._serialized: tuple[int, str] | None = None
+        for source in self.sources:
+            source.attach(self)
+        self._refresh("init")
+        _instances.add(self)
+
+    def __reduce_ex__(self, protocol: SupportsIndex) -> str | tuple[Any, ...]:
+        if self.pickle_mode != "compact":
+            return super().__reduce_ex__(protocol)
+        return _unpickle_compact, (self._compact_state(),)
+
+    def _locked(self, paths: Iterable[Sequence[str]] | None = None) -> contextlib.AbstractContextManager[Any]:
+        """Lock for modifying the configuration at the key ``paths``, or anywhere if None.
+
+        Without lock striping this is ``config_lock``. With striping, the
+        locks of the subtrees at depth ``lock_stripe_depth`` containing the
+        paths are acquired in sorted order. Changes of the whole configuration
+        acquire ``config_lock`` and then every subtree lock.
+
+        """
+        depth = self.lock_stripe_depth
+        if not depth:
+            return self.config_lock
+        if paths is None or isinstance(self.config, PersistentMap):
+            # the root of persistent storage is replaced by every change
+            return self._lock_all()
+        prefixes = set()
+        for path in paths:
+            if len(path) < depth:
+                return self._lock_all()
+            prefixes.add(normalize_path(tuple(path[:depth])))
+        return self._lock_stripes(sorted(prefixes))
+
+    @contextlib.contextmanager
+    def _lock_all(self) -> Iterator[None]:
+        with self.config_lock, contextlib.ExitStack() as stack:
+            # no subtree lock can be created while config_lock is held
+            for prefix in sorted(self._stripes):
+                stack.enter_context(self._stripes[prefix])
+            yield
+
+    @contextlib.contextmanager
+    def _lock_stripes(self, prefixes: list[tuple[str, ...]]) -> Iterator[None]:
+        locks = [self._stripe(prefix) for prefix in prefixes]
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            if all(self._has_parents(prefix) for prefix in prefixes):
+                yield
+                return
+        # creating (and rolling back) a missing intermediate mapping touches other subtrees
+        with self._lock_all():
+            yield
+
+    def _stripe(self, prefix: tuple[str, ...]) -> SerializableLock:
+        lock = self._stripes.get(prefix)
+        if lock is None:
+            with self.config_lock:
+                lock = self._stripes.get(prefix)
+                if lock is None:
+                    # derived from config_lock so that copies in other processes share it
+                    token = f"{self.config_lock.token}:{'.'.join(map(str, prefix))}"
+                    lock = self._stripes[prefix] = SerializableLock(token)
+        return lock
+
+    def _has_parents(self, prefix: tuple[str, ...]) -> bool:
+        node: Any = self.config
+        for k in prefix[:-1]:
+            if not isinstance(node, Mapping):
+                return False
+            node = node.get(k if self.normalize_keys else canonical_name(k, node))
+        return isinstance(node, Mapping)
+
+    def _compact_state(self) -> dict[str, Any]:
+        """State for ``pickle_mode="compact"``, see :func:`_unpickle_compact`."""
+        with self._locked():
+            overrides = self._overrides
+            state: dict[str, Any] = {
+                "name": self.name,
+                "paths": self.paths,
+                "main_path": self.main_path,
+                "env": {k: v for k, v in self.env.items() if k.startswith(self.env_prefix)},
+                "env_prefix": self.env_prefix,
+                "deprecations": self.deprecations,
+                "trace_target": self.trace_target,
+                "normalize_keys": self.normalize_keys,
+                "persistent": isinstance(self.config, PersistentMap),
+                "lazy_load": self.lazy_load,
+                "sources": self.sources,
+                "lazy_env": self._env_expander is not None,
+                "derived": [(d.key, d.func, d.depends_on) for d in self._derived.values()],
+                "defaults": leaf_digest(self.defaults),
+                "fingerprint": None if self.lazy_load else self.fingerprint(),
+            }
+            if overrides is None:
+                state["config"] = self.config
+                state["spellings"] = self._spellings
+                return state
+            state["set"] = []
+            state["unset"] = []
+            for path in sorted(overrides, key=len):
+                try:
+                    state["set"].append((path, _get_in(self.config, path)))
+                except (KeyError, TypeError):
+                    state["unset"].append(path)
+            prefixes = {path[:i] for path in overrides for i in range(1, len(path) + 1)}
+            state["spellings"] = {
+                p: name
+                for p, name in self._spellings.items()
+                if p in prefixes or any(p[:i] in overrides for i in range(1, len(p)))
+            }
+        return state
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        # runtime instrumentation and caches are local to this process
+        state["_access_recorder"] = None
+        del state["_listeners"]
+        del state["_changes_lock"]
+        state["_refresh_waiters"] = []
+        state["_derived"] = [(d.key, d.func, d.depends_on) for d in self._derived.values()]
+        state["_shipped"] = OrderedDict()
+        state["_last_delta"] = state["_applied"] = state["_serialized"] = None
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        derived = state.pop("_derived")
+        self.__dict__.update(state)
+        self._listeners = weakref.WeakSet()
+        self._changes_lock = threading.Lock()
+        self._derived = {}
+        for key, func, depends_on in derived:
+            self.derive(key, func, depends_on)
 
     def __contains__(self, item: Any) -> bool:
         try:
@@ -464,10 +1265,35 @@ class Config:
         return self.get(item)
 
     def pprint(self, **kwargs: Any) -> None:
-        return pprint.pprint(self.config, **kwargs)
+        config = self._plain_config()
+        if self.lazy_load:
+            # pprint only formats plain dictionaries nicely
+            config = copy_tree(config, shallow_leaves=True)
+        return pprint.pprint(config, **kwargs)
+
+    def _normalized(
+        self, new: Mapping[str, Any], spellings: dict[tuple[str, ...], str] | None = None
+    ) -> Mapping[str, Any]:
+        """Normalize keys of incoming configuration when using normalized key storage."""
+        if self.normalize_keys:
+            return normalize_tree(new, self._spellings if spellings is None else spellings)
+        return new
+
+    def _plain_config(self) -> dict[str, Any]:
+        """Configuration as plain dictionaries with keys in their original spelling.
+
+        Only the dictionaries are copied, and only when using normalized key or
+        persistent storage.
+
+        """
+        if self.normalize_keys:
+            return restore_spellings(self.config, self._spellings)
+        if isinstance(self.config, PersistentMap):
+            return self.config.thaw()
+        return self.config
 
     def collect(self, paths: list[str] | None = None, env: Mapping[str, str] | None = None) -> dict[str, Any]:
-        """Collect configuration from paths and environment variables
+        """Collect configuration from paths, sources and environment variables
 
         Parameters
         ----------
@@ -495,11 +1321,18 @@ class Config:
         configs: list[Mapping[str, Any]] = []
 
         # yaml is a hard dependency, so its loader is always available.
-        configs.extend(collect_yaml(paths=paths))
+        configs.extend(collect_yaml(paths=paths, lazy=self.lazy_load))
+
+        configs.extend(source.load() for source in self.sources)
 
         configs.append(collect_env(self.env_prefix, env=env))
 
-        return merge(*configs)
+        trace = current_trace()
+        start = time.perf_counter()
+        result = merge(*configs)
+        if trace is not None:
+            trace.add_merge(time.perf_counter() - start)
+        return result
 
     def refresh(self, **kwargs: Any) -> None:
         """Update configuration by re-reading yaml files and env variables.
@@ -522,12 +1355,145 @@ class Config:
         donfig.Config.update_defaults
 
         """
-        self.clear()
+        self._refresh("refresh", **kwargs)
+
+    def _refresh(self, event: str, **kwargs: Any) -> None:
+        self._publish(*self._build(event, **kwargs))
+
+    def _build(self, event: str, **kwargs: Any) -> tuple[dict[str, Any], dict[tuple[str, ...], str]]:
+        """Collect a complete new configuration on the side, without modifying this object."""
+        trace = StartupTrace(self.name, event) if self.trace_target is not None else None
+        spellings: dict[tuple[str, ...], str] = {}
+        with trace.activate() if trace is not None else nullcontext():
+            config: dict[str, Any] = PersistentMap() if isinstance(self.config, PersistentMap) else {}
+            start = time.perf_counter()
+            for d in self.defaults:
+                config = update(config, self._normalized(d, spellings), priority="old")
+            merge_seconds = time.perf_counter() - start
+            collected = self.collect(**kwargs)
+            start = time.perf_counter()
+            config = update(config, self._normalized(collected, spellings))
+            if self.dedupe_values:
+                config = dedupe_leaves(config, {})
+            merge_seconds += time.perf_counter() - start
+        if trace is not None and self.trace_target is not None:
+            trace.add_merge(merge_seconds)
+            trace.emit(self.trace_target)
+        return config, spellings
+
+    def _publish(
+        self, config: dict[str, Any], spellings: dict[tuple[str, ...], str], keep_overrides: bool = False
+    ) -> None:
+        """Replace the whole configuration by one built with :meth:`_build`.
+
+        With ``keep_overrides`` the values changed since the last refresh, by
+        :meth:`set` for example, are copied into the new configuration first.
+
+        """
+        with self._locked():
+            overrides = self._overrides if keep_overrides and self._overrides is not None else {}
+            if overrides:
+                config = self._with_overrides(config, spellings, overrides)
+            # a single reference swap, readers never see a partial configuration
+            self.config = config
+            self._spellings = spellings
+            self._changed(None)
+            with self._changes_lock:
+                self._overrides = dict(overrides)
+            waiters, self._refresh_waiters = self._refresh_waiters, []
+        for loop, future in waiters:
+            with contextlib.suppress(RuntimeError):  # loop closed
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def _with_overrides(
+        self, config: dict[str, Any], spellings: dict[tuple[str, ...], str], overrides: Iterable[tuple[str, ...]]
+    ) -> dict[str, Any]:
+        """Copy the current values at the key paths ``overrides`` into ``config``, which is not published yet."""
+        current = self.config
+        for path in sorted(overrides, key=len):
+            try:
+                value = _get_in(current, path)
+            except (KeyError, TypeError, IndexError):
+                if isinstance(config, PersistentMap):
+                    config = config.delete_in(path)
+                else:
+                    _delete_in(config, path)
+                continue
+            if isinstance(config, PersistentMap):
+                config = config.set_in(path, value)
+            else:
+                _set_in(config, path, value)
+            for i in range(1, len(path) + 1):
+                if path[:i] in self._spellings:
+                    spellings.setdefault(path[:i], self._spellings[path[:i]])
+        return config
+
+    async def arefresh(self, **kwargs: Any) -> None:
+        """Asynchronous version of :meth:`refresh`.
+
+        Searching, reading and parsing the configuration files happens in the
+        default executor of the running event loop. The new configuration is
+        then published in one step from the event loop, so other tasks see
+        either the old or the new configuration.
+
+        """
+        loop = asyncio.get_running_loop()
+        run = contextvars.copy_context().run
+        config, spellings = await loop.run_in_executor(None, functools.partial(run, self._build, "refresh", **kwargs))
+        self._publish(config, spellings)
+
+    async def acollect(self, paths: list[str] | None = None, env: Mapping[str, str] | None = None) -> dict[str, Any]:
+        """Asynchronous version of :meth:`collect`, running in the default executor of the event loop."""
+        loop = asyncio.get_running_loop()
+        run = contextvars.copy_context().run
+        return await loop.run_in_executor(None, functools.partial(run, self.collect, paths, env))
+
+    async def wait_for_refresh(self) -> None:
+        """Wait until the next refresh of this configuration completed.
+
+        This resolves after the next :meth:`refresh` or :meth:`arefresh`,
+        whichever thread or task it was started from.
+
+        """
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        with self.config_lock:
+            self._refresh_waiters.append((future.get_loop(), future))
+        await future
+
+    def reload_on_signal(self, signum: int | None = None) -> SignalReloader:
+        """Reload the configuration in the background whenever the process receives a signal.
+
+        This gives daemons the classic ``SIGHUP`` reload behavior. The signal
+        handler only sets a flag, a worker thread then collects the new
+        configuration from the search paths and environment like
+        :meth:`refresh` and publishes it in a single step. ``config_lock`` is
+        only held for that final step, so a slow reload never blocks
+        :meth:`set` and the signal handler can never deadlock with it. The
+        duration and number of changed keys of every reload are logged to the
+        ``donfig.reload`` logger and recorded on the returned object.
 
-        for d in self.defaults:
-            update(self.config, d, priority="old")
+        This must be called from the main thread.
+
+        Parameters
+        ----------
+        signum : int, optional
+            Signal to reload on, defaults to ``signal.SIGHUP``.
 
-        update(self.config, self.collect(**kwargs))
+        Returns
+        -------
+        reloader : SignalReloader
+            Call its ``stop()`` method to restore the previous signal handler.
+
+        Examples
+        --------
+        >>> from donfig import Config
+        >>> config = Config('mypkg')
+        >>> reloader = config.reload_on_signal()  # doctest: +SKIP
+        >>> reloader.last_reload  # doctest: +SKIP
+        {'seconds': 0.012, 'changed': 3, 'error': None}
+
+        """
+        return SignalReloader(self, signal.SIGHUP if signum is None else signum)
 
     def get(self, key: str, default: Any = no_default) -> Any:
         """Get elements from global config
@@ -552,19 +1518,277 @@ class Config:
         donfig.Config.set
 
         """
-        keys = key.split(".")
+        if self._derived:
+            derived = self._derived.get(normalize_key(key))
+            if derived is not None:
+                return self._get_derived(key, derived, default)
+        normalized = self.normalize_keys
+        keys = normalize_key(key).split(".") if normalized else key.split(".")
         result = self.config
         for k in keys:
-            k = canonical_name(k, result)
+            if not normalized:
+                k = canonical_name(k, result)
             try:
                 result = result[k]
             except (TypeError, IndexError, KeyError):
+                if self._access_recorder is not None:
+                    self._access_recorder.record(key, False)
                 if default is not no_default:
                     return default
                 else:
                     raise
+        if self._access_recorder is not None:
+            self._access_recorder.record(key, True)
+        if self._env_expander is not None:
+            return self._env_expander.expand(result, tuple(normalize_key(key).split(".")), self.config)
         return result
 
+    def _get_derived(self, key: str, derived: DerivedValue, default: Any) -> Any:
+        try:
+            result = derived.get()
+        except (TypeError, IndexError, KeyError):
+            # a dependency is missing
+            if self._access_recorder is not None:
+                self._access_recorder.record(key, False)
+            if default is not no_default:
+                return default
+            raise
+        if self._access_recorder is not None:
+            self._access_recorder.record(key, True)
+        return result
+
+    def derive(self, key: str, func: Callable[..., Any], depends_on: Sequence[str]) -> None:
+        """Register a configuration value computed from other configuration keys.
+
+        ``func`` is called with the values of the ``depends_on`` keys, in that
+        order, the first time ``key`` is read with :meth:`get`. The result is
+        cached until one of the dependencies changes. Dependencies may be
+        derived keys themselves.
+
+        Derived values are not stored in the configuration: they are only
+        returned by :meth:`get` (and ``config[key]``) for exactly ``key``, and
+        take precedence over a value stored at the same key.
+
+        Parameters
+        ----------
+        key : str
+            Dotted key of the derived value. Registering the same key again
+            replaces the previous definition.
+        func : callable
+            Function computing the value.
+        depends_on : Sequence[str]
+            Dotted keys whose values are passed to ``func``. A key covers
+            everything nested below it.
+
+        Raises
+        ------
+        ValueError
+            If the new value would (indirectly) depend on itself.
+
+        Examples
+        --------
+        >>> from donfig import Config
+        >>> config = Config('mypkg', defaults=[{'worker': {'memory-limit': '4 GiB'}}])
+        >>> config.derive('worker.memory-bytes', parse_bytes, depends_on=['worker.memory-limit'])  # doctest: +SKIP
+        >>> config.get('worker.memory-bytes')  # doctest: +SKIP
+        4294967296
+
+        """
+        new = DerivedValue(self, key, func, depends_on)
+        cycle = self._find_derived_cycle(new, [new])
+        if cycle is not None:
+            raise ValueError(f"Derived configuration value {key!r} depends on itself: {' -> '.join(cycle)}")
+        old = self._derived.pop(normalize_key(key), None)
+        if old is not None:
+            self._listeners.discard(old)
+            self._notify([old.path])
+        self._derived[normalize_key(key)] = new
+        self._listeners.add(new)
+
+    def _find_derived_cycle(self, new: DerivedValue, chain: list[DerivedValue]) -> list[str] | None:
+        """Depth first search for a chain of dependencies from ``chain[-1]`` back to ``new``."""
+        current = chain[-1]
+        others = [d for k, d in self._derived.items() if k != normalize_key(new.key)]
+        for candidate in [new, *others]:
+            if not current.depends_on_path(candidate.path):
+                continue
+            if candidate is new:
+                return [d.key for d in chain] + [new.key]
+            if candidate not in chain:
+                cycle = self._find_derived_cycle(new, chain + [candidate])
+                if cycle is not None:
+                    return cycle
+        return None
+
+    def fingerprint(self, key: str | None = None) -> str:
+        """Digest of the current configuration, or of the value at ``key``.
+
+        Two configurations with the same content have the same fingerprint,
+        which makes it suitable as (part of) a cache key for results that
+        depend on configuration. The digest of every nested mapping is cached
+        and only recomputed after a change of the configuration through this
+        object (:meth:`set`, :meth:`update`, :meth:`refresh`, ...) touched it,
+        so repeated calls are cheap. Values other than plain data are
+        represented by their type and ``repr``.
+
+        Note that modifying the ``config`` dictionary in place bypasses this
+        bookkeeping, replacing it as a whole does not.
+
+        Parameters
+        ----------
+        key : str, optional
+            Dotted key of the part of the configuration to fingerprint, this
+            can be a derived key (see :meth:`derive`). Defaults to the whole
+            configuration.
+
+        Examples
+        --------
+        >>> from donfig import Config
+        >>> config = Config('mypkg')
+        >>> config.fingerprint()  # doctest: +SKIP
+        'c6b6a1f5dbc5d0d63f1b0b8bbd7c07a1'
+        >>> config.fingerprint('foo')  # doctest: +SKIP
+        '41d9cc0a3a50ff9f8d84a4c7bd1c1b1e'
+
+        """
+        if self.config is not self._tracked_config:
+            # the whole configuration was replaced from outside
+            self._changed(None)
+        if key is not None and self._derived:
+            derived = self._derived.get(normalize_key(key))
+            if derived is not None:
+                return leaf_digest(derived.get()).hex()
+        value: Any = self.config
+        path: tuple[str, ...] = ()
+        if key is not None:
+            normalized = self.normalize_keys
+            for k in normalize_key(key).split(".") if normalized else key.split("."):
+                if not normalized:
+                    k = canonical_name(k, value)
+                value = value[k]
+                path += (k,)
+        return self._digests.digest(path, value).hex()
+
+    def _changed(self, paths: Iterable[tuple[str, ...]] | None, rollback: bool = False) -> None:
+        """Record that the configuration changed at the key ``paths``, or anywhere if None.
+
+        Cached fingerprints overlapping the paths are dropped and memoized
+        functions depending on them are notified. A ``rollback`` undoes an
+        earlier change of the same paths, paths that are back to their value
+        of the last refresh no longer count as changed since then.
+
+        """
+        paths = None if paths is None else list(paths)
+        with self._changes_lock:
+            self._tracked_config = self.config
+            self._generation += 1
+            overrides = self._overrides
+            if paths is None:
+                self._overrides = None
+            elif overrides is not None:
+                for path in paths:
+                    count = overrides.get(path, 0) + (-1 if rollback else 1)
+                    if count > 0:
+                        overrides[path] = count
+                    else:
+                        overrides.pop(path, None)
+        self._digests.invalidate(paths)
+        if self._env_expander is None and not self._listeners:
+            # nothing else to tell, which keeps a plain set cheap
+            return
+        normalized = None if paths is None else [normalize_path(p) for p in paths]
+        if self._env_expander is not None:
+            self._env_expander.changed(self.config, normalized)
+        self._notify(normalized)
+
+    def _notify(self, paths: list[tuple[str, ...]] | None) -> None:
+        """Tell memoized functions and derived values that the normalized key ``paths`` changed.
+
+        Unlike :meth:`_changed` this does not count as a change of the stored
+        configuration, it is used for derived values that are recomputed.
+
+        """
+        if not self._listeners:
+            return
+        for listener in list(self._listeners):
+            listener.config_changed(paths)
+
+    def memoize(self, keys: Sequence[str], maxsize: int | None = 128) -> Callable[[Callable[P, R]], Memoized[P, R]]:
+        """Decorator caching the results of a function depending on configuration keys.
+
+        Results are cached per combination of (hashable) arguments and the
+        values of ``keys``. Changing any other part of the configuration keeps
+        the cached results. Results computed within a temporary :meth:`set`
+        are cached separately and never returned outside of it, and a result
+        is not cached if the configuration changed while it was computed.
+
+        Parameters
+        ----------
+        keys : Sequence[str]
+            Dotted configuration keys the function depends on. A key covers
+            everything nested below it.
+        maxsize : int or None
+            Number of results to keep, least recently used results are dropped
+            first. ``None`` keeps all results.
+
+        Examples
+        --------
+        >>> from donfig import Config
+        >>> config = Config('mypkg')
+        >>> @config.memoize(keys=["array.chunk-size", "scheduler"])
+        ... def plan(shape):
+        ...     ...
+
+        The decorated function provides ``cache_info()`` and ``cache_clear()``
+        like functions decorated with :func:`functools.lru_cache`.
+
+        """
+
+        def decorator(func: Callable[P, R]) -> Memoized[P, R]:
+            return Memoized(self, keys, maxsize, func)
+
+        return decorator
+
+    def start_access_recording(self, sample_every: int = 1) -> AccessRecorder:
+        """Start recording which configuration keys are read and how often.
+
+        Every lookup through :meth:`get`, ``config[key]`` and ``key in config``
+        is counted per normalized dotted key along with the calling module.
+        Lookups that fall back to a default or fail are counted as misses.
+
+        Parameters
+        ----------
+        sample_every : int
+            Only record every n-th lookup to bound the overhead on hot paths.
+
+        See Also
+        --------
+        donfig.Config.access_report
+        donfig.Config.stop_access_recording
+
+        """
+        self._access_recorder = AccessRecorder(sample_every=sample_every)
+        return self._access_recorder
+
+    def stop_access_recording(self) -> AccessRecorder | None:
+        """Stop recording key accesses and return the recorder used, if any."""
+        recorder, self._access_recorder = self._access_recorder, None
+        return recorder
+
+    def access_report(self, top: int = 20) -> dict[str, Any]:
+        """Report the hottest keys and the keys that were never read.
+
+        See :meth:`start_access_recording`. The returned dictionary contains
+        ``hot`` and ``misses`` lists with the ``top`` most accessed keys and
+        their calling modules, and ``unread``, every leaf key of the current
+        configuration for which neither the key nor one of its parents was
+        read.
+
+        """
+        if self._access_recorder is None:
+            raise RuntimeError("Access recording is not active, call 'start_access_recording' first")
+        return self._access_recorder.report(self._plain_config(), top=top)
+
     def update_defaults(self, new: Mapping[str, Any]) -> None:
         """Add a new set of defaults to the configuration
 
@@ -576,11 +1800,13 @@ class Config:
             is the old default, in which case it's updated to the new default.
 
         """
-        current_defaults = merge(*self.defaults)
+        current_defaults = merge(*(self._normalized(d) for d in self.defaults))
         self.defaults.append(new)
-        update(self.config, new, priority="new-defaults", defaults=current_defaults)
+        new = self._normalized(new)
+        self.config = update(self.config, new, priority="new-defaults", defaults=current_defaults)
+        self._changed(path for path, _ in iter_leaves(new))
 
-    def to_dict(self) -> dict[str, Any]:
+    def to_dict(self, shallow_leaves: bool = False) -> dict[str, Any]:
         """Return dictionary copy of configuration.
 
         .. warning::
@@ -589,12 +1815,26 @@ class Config:
             may cause unwanted side effects depending on what values exist
             in the current configuration.
 
+        Parameters
+        ----------
+        shallow_leaves : bool
+            Only copy the dictionaries, lists and tuples of the configuration
+            and share all other values with the configuration instead of
+            deep-copying them.
+
         """
-        return deepcopy(self.config)
+        config = restore_spellings(self.config, self._spellings) if self.normalize_keys else self.config
+        result: dict[str, Any] = copy_tree(config, shallow_leaves=shallow_leaves)
+        return result
 
     def clear(self) -> None:
         """Clear all existing configuration."""
-        self.config.clear()
+        if isinstance(self.config, PersistentMap):
+            self.config = PersistentMap()
+        else:
+            self.config.clear()
+        self._spellings.clear()
+        self._changed(None)
 
     def merge(self, *dicts: Mapping[str, Any]) -> None:
         """Merge this configuration with multiple dictionaries.
@@ -602,7 +1842,9 @@ class Config:
         See :func:`~donfig.config_obj.merge` for more information.
 
         """
+        dicts = tuple(self._normalized(d) for d in dicts)
         self.config = merge(self.config, *dicts)
+        self._changed(path for d in dicts for path, _ in iter_leaves(d))
 
     def update(self, new: Mapping[str, Any], priority: Literal["old", "new", "new-defaults"] = "new") -> None:
         """Update the internal configuration dictionary with `new`.
@@ -610,15 +1852,35 @@ class Config:
         See :func:`~donfig.config_obj.update` for more information.
 
         """
+        new = self._normalized(new)
         self.config = update(self.config, new, priority=priority)
+        self._changed(path for path, _ in iter_leaves(new))
 
-    def expand_environment_variables(self) -> None:
+    def expand_environment_variables(self, lazy: bool = False) -> None:
         """Expand any environment variables in this configuration in-place.
 
         See :func:`~donfig.config_obj.expand_environment_variables` for more information.
 
+        Parameters
+        ----------
+        lazy : bool
+            Instead of rebuilding the whole configuration now, expand
+            environment variables in the values returned by :meth:`get` from
+            now on. Template strings are detected when this is called and on
+            every :meth:`refresh`, and expanded values are cached until one
+            of the environment variables they reference changes. The
+            configuration itself (``config``, :meth:`to_dict`, ...) keeps the
+            unexpanded templates.
+
         """
-        self.config = expand_environment_variables(self.config)
+        if lazy:
+            self._env_expander = _LazyEnvExpander()
+            self._env_expander.scan(self.config)
+            return
+        self._env_expander = None
+        expanded = expand_environment_variables(self.config)
+        self.config = PersistentMap(expanded) if isinstance(self.config, PersistentMap) else expanded
+        self._changed(None)
 
     def rename(self, aliases: Mapping[str, str]) -> None:
         """Rename old keys to new keys
@@ -635,7 +1897,14 @@ class Config:
                 new[n] = value
 
         for k in old:
-            del self.config[canonical_name(k, self.config)]  # TODO: support nested keys
+            if self.normalize_keys:
+                k = normalize_key(k)
+            k = canonical_name(k, self.config)
+            if isinstance(self.config, PersistentMap):
+                self.config = self.config.delete(k)
+            else:
+                del self.config[k]  # TODO: support nested keys
+            self._changed([(k,)])
 
         self.set(new)
 
@@ -676,7 +1945,62 @@ class Config:
         donfig.Config.get
 
         """
-        return ConfigSet(self.config, self.config_lock, self.deprecations, arg=arg, **kwargs)
+        return _OwnedConfigSet(self, arg, **kwargs)
+
+    def prepare_set(self, arg: Mapping[str, Any] | None = None, **kwargs: Any) -> ConfigPatch:
+        """Prepare configuration values to be set repeatedly within a context manager.
+
+        Takes the same arguments as :meth:`set`, but nothing is applied until
+        the returned :class:`~donfig.config_obj.ConfigPatch` is entered. Key
+        parsing and deprecation checks happen once, here, so entering the patch
+        many times (for example in test suites or per request) is cheaper than
+        calling :meth:`set` each time.
+
+        Examples
+        --------
+        >>> from donfig import Config
+        >>> config = Config('mypkg')
+        >>> fast = config.prepare_set({'foo.bar': 123}, foo__baz=True)
+        >>> with fast:
+        ...     pass
+
+        See Also
+        --------
+        donfig.Config.set
+
+        """
+        return ConfigPatch(self, arg, **kwargs)
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """Return an immutable snapshot of the current configuration.
+
+        With persistent storage (``Config(..., persistent=True)``) this is
+        free: the current tree is returned as is and later changes made with
+        :meth:`set`, :meth:`update`, ... never affect it. Otherwise the
+        configuration is copied into a new persistent mapping. Either way
+        only the mappings are immutable. Leaf values, lists included, are
+        shared with the configuration, not copied, so modifying them in place
+        also modifies the snapshot.
+
+        See Also
+        --------
+        donfig.Config.restore
+
+        """
+        if isinstance(self.config, PersistentMap):
+            return self.config
+        with self._locked():
+            return PersistentMap(self.config)
+
+    def restore(self, snapshot: Mapping[str, Any]) -> None:
+        """Roll the configuration back to a snapshot taken by :meth:`snapshot`."""
+        with self._locked():
+            if isinstance(self.config, PersistentMap):
+                self.config = freeze(snapshot)
+            else:
+                self.config.clear()
+                update(self.config, snapshot)
+            self._changed(None)
 
     def ensure_file(self, source: str, destination: str | None = None, comment: bool = True) -> None:
         """Copy file to default location if it does not already exist
@@ -734,6 +2058,8 @@ class Config:
                     os.remove(tmp)
         except OSError:
             pass
+        # make the new file visible to the next refresh right away
+        forget_path(directory)
 
     def serialize(self) -> str:
         """Serialize config data into a string.
@@ -741,7 +2067,266 @@ class Config:
         See :func:`serialize` for more information.
 
         """
-        return serialize(self.config)
+        return serialize(self._plain_config())
+
+    def subprocess_env(self, base: Mapping[str, str] | None = None) -> dict[str, str]:
+        """Environment for a child process inheriting this configuration.
+
+        This is a copy of ``base`` (``os.environ`` by default) with the
+        ``MYPKG_INTERNAL_INHERIT_CONFIG`` variable set to the serialized
+        configuration. The serialized configuration is cached until the
+        configuration changes.
+
+        Examples
+        --------
+        >>> subprocess.run(["python", "-m", "mypkg.worker"], env=config.subprocess_env())  # doctest: +SKIP
+
+        """
+        env = dict(os.environ if base is None else base)
+        env[_inherit_env_var(self.env_prefix)] = self._cached_serialize()
+        return env
+
+    def subprocess_envs(
+        self, extras: Iterable[Mapping[str, str]], base: Mapping[str, str] | None = None
+    ) -> list[dict[str, str]]:
+        """Environments for many child processes, see :meth:`subprocess_env`.
+
+        The configuration is serialized and ``base`` is copied once, every
+        environment is then that copy updated with one item of ``extras``.
+
+        """
+        env = self.subprocess_env(base)
+        return [{**env, **extra} for extra in extras]
+
+    def _cached_serialize(self) -> str:
+        if self.config is not self._tracked_config:
+            # the whole configuration was replaced from outside
+            self._changed(None)
+        cached = self._serialized
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        generation = self._generation
+        payload = serialize(self._plain_config())
+        self._serialized = (generation, payload)
+        return payload
+
+    def _lookup(self, key: str | None) -> tuple[Any, tuple[str, ...]]:
+        """Stored value and key path of the dotted ``key``, raising KeyError if it is missing."""
+        node: Any = self.config
+        path: tuple[str, ...] = ()
+        if key is not None:
+            for k in normalize_key(key).split(".") if self.normalize_keys else key.split("."):
+                if not self.normalize_keys:
+                    k = canonical_name(k, node)
+                node = node[k]
+                path += (k,)
+        return node, path
+
+    def iter_flat(self, prefix: str | None = None) -> Iterator[tuple[str, Any]]:
+        """Iterate over ``(dotted_key, value)`` pairs of all leaf values.
+
+        Nothing is copied, the values are the ones stored in the
+        configuration and keys are generated as the iteration goes. Empty
+        mappings are yielded as leaves. Modifying the configuration while
+        iterating is not supported, iterate over a :meth:`snapshot` instead
+        if other threads may modify it.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            Dotted key of the part of the configuration to iterate over.
+            Keys yielded start with ``prefix``, spelled as in the
+            configuration like the rest of the keys.
+
+        Examples
+        --------
+        >>> config = Config('mypkg', defaults=[{'a': {'b': 1, 'c': {'d': 2}}}])
+        >>> list(config.iter_flat())
+        [('a.b', 1), ('a.c.d', 2)]
+        >>> list(config.iter_flat('a.c'))
+        [('a.c.d', 2)]
+
+        """
+        node, path = self._lookup(prefix)
+        spellings = self._spellings if self.normalize_keys else None
+        name = ".".join(str(k if spellings is None else spellings.get(path[: i + 1], k)) for i, k in enumerate(path))
+        if not isinstance(node, Mapping) or not node:
+            if prefix is not None:
+                yield name, node
+            return
+        yield from _iter_flat(node, name, path, spellings)
+
+    def dump(self, stream: IO[str], key: str | None = None, fmt: Literal["yaml", "json"] = "yaml") -> None:
+        """Write the configuration, or the value at ``key``, to a text stream.
+
+        The output is written piece by piece while walking the
+        configuration, without building a copy of it or the whole text in
+        memory first. Values are written like :func:`yaml.safe_dump` and
+        :func:`json.dump` would, keys keep their order.
+
+        Parameters
+        ----------
+        stream : file-like
+            Text stream to write to.
+        key : str, optional
+            Dotted key of the part of the configuration to write.
+        fmt : {"yaml", "json"}
+            Output format.
+
+        Examples
+        --------
+        >>> with open('config.yaml', 'w') as f:  # doctest: +SKIP
+        ...     config.dump(f)
+
+        """
+        node, path = self._lookup(key)
+        spellings = self._spellings if self.normalize_keys else None
+        if fmt == "json":
+            write_json(node, stream.write, path, spellings)
+            stream.write("\n")
+        elif fmt == "yaml":
+            yaml.emit(yaml_events(node, spellings, path), stream, Dumper=yaml.SafeDumper)
+        else:
+            raise ValueError(f"Unknown format {fmt!r}, expected 'yaml' or 'json'")
+
+    def memory_usage(self, path: str | None = None) -> dict[str, int]:
+        """Approximate memory used by the configuration, per subtree.
+
+        Parameters
+        ----------
+        path : str, optional
+            Dotted key of the subtree to report on. Defaults to the whole
+            configuration.
+
+        Returns
+        -------
+        usage : dict
+            Number of bytes used by the value at every key directly below
+            ``path``, from the largest to the smallest. Objects shared
+            between subtrees, like interned keys or deduplicated values (see
+            ``dedupe_values``), are only counted once. Sections not loaded
+            yet with ``lazy_load=True`` count as empty. If the value at
+            ``path`` is not a mapping, its own size is reported.
+
+        Examples
+        --------
+        >>> config.memory_usage()  # doctest: +SKIP
+        {'distributed': 182344, 'array': 5120, 'scheduler': 59}
+
+        """
+        node, prefix = self._lookup(path)
+        if path is not None and not isinstance(node, Mapping):
+            return {path: tree_size(node, set())}
+        seen: set[int] = {id(node)}
+        usage: dict[str, int] = {}
+        for k, v in node.items():
+            name = self._spellings.get(prefix + (k,), k) if self.normalize_keys else k
+            usage[name if path is None else f"{path}.{name}"] = tree_size(k, seen) + tree_size(v, seen)
+        return dict(sorted(usage.items(), key=lambda item: item[1], reverse=True))
+
+    @property
+    def generation(self) -> int:
+        """Number increased by every change made through this object."""
+        return self._generation
+
+    def executor_initializer(self) -> Callable[[str, str, str, int], None]:
+        """Initializer installing this configuration in the workers of a process pool.
+
+        Use it together with :meth:`as_initargs` so the configuration is sent
+        once per worker instead of with every task. Workers see it in the
+        configuration objects of the same name that exist when they start and
+        in the ones created later, through the
+        ``MYPKG_INTERNAL_INHERIT_CONFIG`` environment variable. Changes made
+        afterwards can be sent with the tasks using :meth:`delta_since` and
+        :meth:`apply_delta`.
+
+        Examples
+        --------
+        >>> from concurrent.futures import ProcessPoolExecutor
+        >>> pool = ProcessPoolExecutor(
+        ...     initializer=config.executor_initializer(), initargs=config.as_initargs()
+        ... )  # doctest: +SKIP
+
+        """
+        return _install_config
+
+    def as_initargs(self) -> tuple[str, str, str, int]:
+        """Arguments for the function returned by :meth:`executor_initializer`.
+
+        The last item is the current :attr:`generation`, to be passed to
+        :meth:`delta_since` later.
+
+        """
+        with self._locked():
+            payload = self._cached_serialize()
+            generation = self._generation
+            # leaves are copied too, changes made to them in place must show up in later deltas
+            self._shipped[generation] = copy_tree(self._plain_config())
+            self._shipped.move_to_end(generation)
+            while len(self._shipped) > _SHIPPED_SNAPSHOTS:
+                self._shipped.popitem(last=False)
+        return self.name, self.env_prefix, payload, generation
+
+    def delta_since(self, generation: int) -> ConfigDelta:
+        """Changes since the configuration of ``generation`` was sent with :meth:`as_initargs`.
+
+        The result is cached until the configuration changes again, so it
+        is cheap to call for every submitted task.
+
+        Raises
+        ------
+        ValueError
+            If the configuration of ``generation`` is not known (anymore).
+
+        """
+        delta = self._last_delta
+        if delta is not None and delta.base == generation and delta.generation == self._generation:
+            return delta
+        with self._locked():
+            try:
+                base = self._shipped[generation]
+            except KeyError:
+                raise ValueError(f"Configuration generation {generation} was not sent with as_initargs") from None
+            current = self._generation
+            after = dict(iter_leaves(self._plain_config()))
+        before = dict(iter_leaves(base))
+        delta = ConfigDelta(
+            generation,
+            current,
+            [(k, v) for k, v in after.items() if before.get(k, _MISSING) != v],
+            [k for k in before.keys() - after.keys()],
+        )
+        self._last_delta = delta
+        return delta
+
+    def apply_delta(self, delta: ConfigDelta) -> None:
+        """Apply changes received from :meth:`delta_since` of the sending process.
+
+        Changes are applied on top of the configuration as it was when the
+        first delta was applied, so a newer delta replaces an older one.
+        Nothing is done if the configuration of ``delta.generation``, or a
+        newer one, was already applied, so deltas arriving out of order never
+        bring back an older state.
+
+        """
+        applied = self._applied
+        if applied is not None and delta.generation <= applied[1]:
+            return
+        if applied is not None and applied[0] == delta.base:
+            base = applied[2]
+        else:
+            base = copy_tree(self._plain_config(), shallow_leaves=True)
+        tree = copy_tree(base, shallow_leaves=True)
+        for path in delta.unset:
+            _delete_in(tree, path)
+        for path, value in delta.set:
+            _set_in(tree, path, value)
+        spellings: dict[tuple[str, ...], str] = {}
+        config: dict[str, Any] = dict(self._normalized(tree, spellings))
+        if isinstance(self.config, PersistentMap):
+            config = PersistentMap(config)
+        self._publish(config, spellings if self.normalize_keys else {})
+        self._applied = (delta.base, delta.generation, base)
 
 
 def serialize(data: Any) -> str:
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Serve a merged configuration to local processes over a Unix domain socket.
+
+A :class:`ConfigServer` owns a :class:`~donfig.Config` and serves it to any
+number of local processes. Worker processes create their configuration with
+a :class:`ServerSource` instead of searching and parsing files themselves:
+
+.. code-block:: python
+
+    # in the daemon
+    server = ConfigServer(Config("mypkg"), "/run/mypkg/config.sock")
+    server.serve_forever()
+
+    # in every worker
+    config = Config("mypkg", paths=[], sources=[ServerSource("/run/mypkg/config.sock")])
+
+The daemon can also be started with ``python -m donfig.server mypkg
+/run/mypkg/config.sock``, which also reloads the configuration on ``SIGHUP``.
+
+The protocol is newline delimited JSON. After connecting, a client receives
+one ``{"type": "snapshot", "generation": n, "config": {...}}`` message and
+then a ``{"type": "delta", "generation": n + 1, "set": [[path, value], ...],
+"unset": [path, ...]}`` message for every change of the served
+configuration, where ``path`` is the list of nested keys of a leaf value.
+Values are sent as JSON, values JSON can not represent are converted to
+strings.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+from ._tree import copy_tree, iter_leaves
+from .config_obj import Config
+from .sources import ConfigSource
+
+logger = logging.getLogger("donfig.server")
+
+_MISSING = object()
+
+
+class ConfigServer:
+    """Serve ``config`` on the Unix domain socket ``path``.
+
+    Changes made to ``config`` through its methods (:meth:`~donfig.Config.set`,
+    :meth:`~donfig.Config.refresh`, reloads on signals, ...) are pushed to all
+    connected clients. A client that does not take a message within
+    ``send_timeout`` seconds is disconnected, so it can not hold up the
+    others, and fetches a new snapshot the next time it loads.
+
+    """
+
+    def __init__(self, config: Config, path: str, send_timeout: float = 5.0) -> None:
+        self.config = config
+        self.path = path
+        self.send_timeout = send_timeout
+        self.generation = 0
+        self._tree = copy_tree(config._plain_config(), shallow_leaves=True)
+        self._leaves = dict(iter_leaves(self._tree))
+        self._clients: list[socket.socket] = []
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._closed = False
+        self._threads: list[threading.Thread] = []
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        # only the owner of the process may connect, the configuration can hold credentials
+        umask = os.umask(0o177)
+        try:
+            self._socket.bind(path)
+        finally:
+            os.umask(umask)
+        self._socket.listen()
+        config._listeners.add(self)
+
+    def config_changed(self, paths: Sequence[tuple[Any, ...]] | None) -> None:
+        # called from whichever thread changed the configuration, the diff is done in the publisher thread
+        self._pending.set()
+
+    def start(self) -> None:
+        """Accept clients and publish changes in background threads."""
+        for target in (self._accept, self._publish):
+            thread = threading.Thread(target=target, name=f"donfig-server-{target.__name__}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def serve_forever(self) -> None:
+        """Start serving and block until :meth:`close` is called."""
+        self.start()
+        for thread in self._threads:
+            thread.join()
+
+    def close(self) -> None:
+        """Stop serving, disconnect all clients and remove the socket file."""
+        if self._closed:
+            return
+        self._closed = True
+        self.config._listeners.discard(self)
+        self._pending.set()
+        with contextlib.suppress(OSError):
+            self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+        with self._lock:
+            for conn in self._clients:
+                conn.close()
+            self._clients.clear()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.path)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def __enter__(self) -> ConfigServer:
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _accept(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                return
+            # sends happen under the lock, a client that stops reading must not block them for long
+            conn.settimeout(self.send_timeout)
+            with self._lock:
+                message = {"type": "snapshot", "generation": self.generation, "config": self._tree}
+                try:
+                    conn.sendall(_encode(message))
+                except OSError:
+                    conn.close()
+                    continue
+                self._clients.append(conn)
+
+    def _publish(self) -> None:
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+            if self._closed:
+                return
+            tree = copy_tree(self.config._plain_config(), shallow_leaves=True)
+            leaves = dict(iter_leaves(tree))
+            old = self._leaves
+            changed = [[list(k), v] for k, v in leaves.items() if old.get(k, _MISSING) != v]
+            removed = [list(k) for k in old.keys() - leaves.keys()]
+            if not changed and not removed:
+                continue
+            with self._lock:
+                self.generation += 1
+                self._tree, self._leaves = tree, leaves
+                data = _encode({"type": "delta", "generation": self.generation, "set": changed, "unset": removed})
+                for conn in list(self._clients):
+                    try:
+                        conn.sendall(data)
+                    except OSError:
+                        conn.close()
+                        self._clients.remove(conn)
+
+
+class ServerSource(ConfigSource):
+    """Configuration source receiving its configuration from a :class:`ConfigServer`.
+
+    The snapshot is fetched once, on the first load, and kept up to date
+    with the changes pushed by the server. Every change rebuilds the
+    configuration object the source belongs to, keeping the values changed
+    with :meth:`~donfig.Config.set`, :meth:`~donfig.Config.update`, ...
+    since its last :meth:`~donfig.Config.refresh`. If the server can not be
+    reached the last known configuration is used, or none at all.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix domain socket the server listens on.
+    timeout : float
+        Seconds to wait for the server when connecting.
+
+    """
+
+    def __init__(self, path: str, timeout: float = 10.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.generation: int | None = None
+        self._tree: dict[str, Any] | None = None
+        self._config: Config | None = None
+        self._socket: socket.socket | None = None
+        self._lock = threading.RLock()
+        self._updated = threading.Condition(self._lock)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # connect again from the other process
+        return ServerSource, (self.path, self.timeout)
+
+    def attach(self, config: Config) -> None:
+        self._config = config
+
+    def load(self) -> Mapping[str, Any]:
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+            return copy_tree(self._tree) if self._tree is not None else {}
+
+    def wait_for_generation(self, generation: int, timeout: float | None = None) -> bool:
+        """Wait until the configuration of at least ``generation`` was received and applied."""
+        with self._updated:
+            return self._updated.wait_for(
+                lambda: self.generation is not None and self.generation >= generation, timeout
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            sock, self._socket = self._socket, None
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+            sock.close()
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            stream = sock.makefile("rb")
+            message = json.loads(stream.readline())
+        except (OSError, ValueError) as exc:
+            sock.close()
+            logger.warning("Could not get configuration from %r: %s", self.path, exc)
+            return
+        sock.settimeout(None)
+        self._socket = sock
+        self._tree = message["config"]
+        self.generation = message["generation"]
+        thread = threading.Thread(target=self._receive, args=(sock, stream), name="donfig-server-source", daemon=True)
+        thread.start()
+
+    def _receive(self, sock: socket.socket, stream: Any) -> None:
+        for line in stream:
+            try:
+                self._apply(sock, json.loads(line))
+            except Exception:
+                logger.exception("Could not apply the configuration received from %r", self.path)
+                # start over from a new snapshot on the next load
+                with self._lock:
+                    if sock is self._socket:
+                        self._socket = None
+                sock.close()
+                return
+            with self._updated:
+                self._updated.notify_all()
+            if sock is not self._socket:
+                return
+        # the server went away, keep the last known configuration
+        with self._lock:
+            if sock is self._socket:
+                self._socket = None
+        sock.close()
+
+    def _apply(self, sock: socket.socket, message: Mapping[str, Any]) -> None:
+        with self._lock:
+            if sock is not self._socket:
+                return
+            if self._tree is None or self.generation is None or message["generation"] != self.generation + 1:
+                # missed a change, fetch a new snapshot on the next load
+                self._socket = None
+                sock.close()
+            else:
+                for path in message["unset"]:
+                    _delete_in(self._tree, path)
+                for path, value in message["set"]:
+                    _set_in(self._tree, path, value)
+                self.generation = message["generation"]
+        config = self._config
+        if config is not None:
+            # unlike refresh, values changed in this process with set, update, ... are kept
+            config._publish(*config._build("refresh"), keep_overrides=True)
+
+
+def _set_in(tree: dict[str, Any], path: Sequence[str], value: Any) -> None:
+    for key in path[:-1]:
+        child = tree.get(key)
+        if not isinstance(child, dict):
+            child = tree[key] = {}
+        tree = child
+    tree[path[-1]] = value
+
+
+def _delete_in(tree: dict[str, Any], path: Sequence[str]) -> None:
+    """Delete the value at ``path`` and the mappings left empty by that."""
+    parents = []
+    for key in path[:-1]:
+        child = tree.get(key)
+        if not isinstance(child, dict):
+            return
+        parents.append((tree, key))
+        tree = child
+    tree.pop(path[-1], None)
+    for parent, key in reversed(parents):
+        if parent[key]:
+            break
+        del parent[key]
+
+
+def _encode(message: Mapping[str, Any]) -> bytes:
+    return json.dumps(message, default=str).encode() + b"\n"
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run a configuration server until interrupted."""
+    parser = argparse.ArgumentParser(prog="python -m donfig.server", description=main.__doc__)
+    parser.add_argument("name", help="name of the configuration, as passed to donfig.Config")
+    parser.add_argument("path", help="path of the Unix domain socket to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    config = Config(args.name)
+    config.reload_on_signal()
+    server = ConfigServer(config, args.path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
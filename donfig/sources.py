@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# Copyright (c) 2026- Donfig Developers
+"""Additional configuration layers besides YAML files and environment variables."""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from ._lazy import LazyDict
+
+if TYPE_CHECKING:
+    from .config_obj import Config
+
+# One row per item of every mapping: parent is the JSON list of keys leading to
+# the mapping, key the JSON key of the item and value its JSON value, or NULL
+# for a non-empty mapping whose items are rows of their own.
+_SCHEMA = """
+CREATE TABLE config (
+    parent TEXT NOT NULL,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT,
+    PRIMARY KEY (parent, key)
+) WITHOUT ROWID
+"""
+
+
+class ConfigSource(abc.ABC):
+    """Base class of configuration sources.
+
+    Sources are passed to :class:`donfig.Config` with the ``sources``
+    keyword argument. Every collection of the configuration (creation and
+    :meth:`~donfig.Config.refresh`) merges the result of :meth:`load` of each
+    source, in order, on top of the YAML files and below the environment
+    variables. Defaults still have the lowest priority and values set with
+    :meth:`~donfig.Config.set` the highest.
+
+    """
+
+    def attach(self, config: Config) -> None:  # noqa: B027 - optional
+        """Called once when the source is added to ``config``, before the first :meth:`load`.
+
+        Sources that learn about changes by themselves can keep the
+        configuration object to call its :meth:`~donfig.Config.refresh`.
+
+        """
+
+    @abc.abstractmethod
+    def load(self) -> Mapping[str, Any]:
+        """Return the configuration provided by this source."""
+
+    def close(self) -> None:  # noqa: B027 - optional
+        """Release any resources held by this source."""
+
+
+class SQLiteSource(ConfigSource):
+    """Configuration source reading a database built by :func:`compile_config_db`.
+
+    Loading only reads the top level of the configuration. Every nested
+    mapping is fetched with one indexed query when it is first accessed,
+    for example by :meth:`~donfig.Config.get`, and kept afterwards, so
+    reading a key only fetches the mappings along its path. Every
+    :meth:`~donfig.Config.refresh` starts over from the current content of
+    the database, also after :func:`compile_config_db` replaced it. A
+    database that does not exist provides no configuration, like a missing
+    YAML search path.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._file_id: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return SQLiteSource, (self.path,)
+
+    def _connect(self) -> sqlite3.Connection | None:
+        """Connection to the current database file, a new one if the file was replaced."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        file_id = (st.st_dev, st.st_ino)
+        if self._connection is None or file_id != self._file_id:
+            # sections of earlier loads keep the connection to the file they were listed from
+            uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+            self._connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._file_id = file_id
+        return self._connection
+
+    def _query(self, connection: sqlite3.Connection, sql: str, *params: Any) -> list[tuple[Any, ...]]:
+        # sections may be loaded from any thread, the lock serializes access
+        with self._lock:
+            return connection.execute(sql, params).fetchall()
+
+    def load(self) -> Mapping[str, Any]:
+        with self._lock:
+            connection = self._connect()
+        if connection is None:
+            return {}
+        return self._load_mapping(connection, [])
+
+    def _load_mapping(self, connection: sqlite3.Connection, path: list[Any]) -> dict[str, Any]:
+        """Items of the mapping at the key ``path``, nested mappings are loaded when accessed."""
+        result: dict[str, Any] = {}
+        rows = self._query(
+            connection, "SELECT key, value FROM config WHERE parent = ? ORDER BY position", json.dumps(path)
+        )
+        for key, value in rows:
+            key = json.loads(key)
+            if value is None:
+                result[key] = LazyDict(partial(self._load_mapping, connection, [*path, key]))
+            else:
+                result[key] = json.loads(value)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._file_id = None
+
+
+def compile_config_db(paths: Sequence[str], database: str) -> int:
+    """Compile the YAML and JSON configuration files found at ``paths`` into a database.
+
+    The files are found and merged like :meth:`donfig.Config.collect` does
+    and every leaf value is stored in the database as JSON, with the key path
+    of the mapping containing it, to be read by :class:`SQLiteSource`.
+    Values JSON can not represent are stored as strings. The database is
+    replaced atomically.
+
+    Returns
+    -------
+    count : int
+        Number of values stored.
+
+    """
+    from .config_obj import collect_yaml, merge
+
+    config = merge(*collect_yaml(paths))
+    rows = list(_rows(config, []))
+
+    tmp = f"{database}.tmp.{os.getpid()}"
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp)
+    connection = sqlite3.connect(tmp)
+    try:
+        with connection:
+            connection.execute(_SCHEMA)
+            connection.executemany("INSERT INTO config VALUES (?, ?, ?, ?)", rows)
+    finally:
+        connection.close()
+    os.replace(tmp, database)
+    return sum(value is not None for *_, value in rows)
+
+
+def _rows(mapping: Mapping[Any, Any], path: list[Any]) -> Iterator[tuple[str, str, int, str | None]]:
+    parent = json.dumps(path, default=str)
+    for position, (key, value) in enumerate(mapping.items()):
+        if isinstance(value, Mapping) and value:
+            yield parent, json.dumps(key, default=str), position, None
+            yield from _rows(value, [*path, key])
+        else:
+            yield parent, json.dumps(key, default=str), position, json.dumps(value, default=str)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Compile configuration files into a database for :class:`SQLiteSource`."""
+    parser = argparse.ArgumentParser(prog="python -m donfig.sources", description=main.__doc__)
+    parser.add_argument("database", help="path of the database to create or replace")
+    parser.add_argument("paths", nargs="+", help="configuration files or directories, later ones take precedence")
+    args = parser.parse_args(argv)
+    count = compile_config_db(args.paths, args.database)
+    print(f"Stored {count} values in {args.database}")
+
+
+if __name__ == "__main__":
+    main()
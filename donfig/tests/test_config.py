@@ -3,8 +3,12 @@
 # Copyright (c) 2014-2018, Anaconda, Inc. and contributors
 from __future__ import annotations
 
+import json
+import logging
 import os
+import signal
 import site
+import socket
 import stat
 import subprocess
 import sys
@@ -626,11 +630,15 @@ def test_serialization() -> None:
     assert new_config.get("one_key") == "one_value"
 
 
-def test_deprecations_rename() -> None:
-    config = Config(CONFIG_NAME, deprecations={"fuse_ave_width": "optimization.fuse.ave-width"})
+@pytest.mark.parametrize("lock_stripe_depth", [0, 1])
+def test_deprecations_rename(lock_stripe_depth: int) -> None:
+    config = Config(
+        CONFIG_NAME, deprecations={"fuse_ave_width": "optimization.fuse.ave-width"}, lock_stripe_depth=lock_stripe_depth
+    )
     with pytest.warns(Warning) as info, config.set(fuse_ave_width=123):
         assert config.get("optimization.fuse.ave-width") == 123
 
+    assert len(info) == 1
     assert "optimization.fuse.ave-width" in str(info[0].message)
 
 
@@ -661,3 +669,1169 @@ def test_config_inheritance(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv(f"{ENV_PREFIX}_INTERNAL_INHERIT_CONFIG", ser_dict)
     config = Config(CONFIG_NAME)
     assert config.get("array.svg.size") == 150
+
+
+def test_trace_to_file(tmpdir: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    dir_path = str(tmpdir)
+    with open(os.path.join(dir_path, "a.yaml"), "w") as f:
+        yaml.dump({"x": 1}, f)
+    trace_path = os.path.join(dir_path, "trace.jsonl")
+    missing = os.path.join(dir_path, "missing")
+    monkeypatch.setenv(ENV_PREFIX + "TRACE", trace_path)
+
+    config = Config(CONFIG_NAME, paths=[dir_path, missing], env={ENV_PREFIX + "Y": "2", "OTHER": "3"})
+    config.refresh()
+
+    with open(trace_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["event"] for r in records] == ["init", "refresh"]
+    record = records[0]
+    assert record["name"] == CONFIG_NAME
+    assert {"path": dir_path, "status": "directory"} in record["paths"]
+    assert {"path": missing, "status": "not found"} in record["paths"]
+    [file_record] = record["files"]
+    assert file_record["path"] == os.path.join(dir_path, "a.yaml")
+    assert file_record["size"] > 0
+    assert record["env"] == {"considered": 2, "matched": [ENV_PREFIX + "Y"]}
+    assert record["merge_seconds"] >= 0
+    assert config.get("x") == 1
+
+
+def test_trace_to_logger(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    monkeypatch.setenv(ENV_PREFIX + "TRACE", "1")
+    with caplog.at_level("INFO", logger="donfig.trace"):
+        Config(CONFIG_NAME, paths=[])
+    assert len(caplog.records) == 1
+    assert '"event": "init"' in caplog.records[0].getMessage()
+
+    caplog.clear()
+    monkeypatch.setenv(ENV_PREFIX + "TRACE", "0")
+    Config(CONFIG_NAME, paths=[])
+    assert not caplog.records
+
+
+def test_access_recording() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"x": 1, "y": {"a_b": 2, "c": 3}, "z": {"d": 4}})
+    with pytest.raises(RuntimeError):
+        config.access_report()
+
+    config.start_access_recording()
+    config.get("x")
+    assert config["y.a-b"] == 2
+    assert "y.a_b" in config
+    assert config.get("missing", 5) == 5
+    assert "y.nope" not in config
+    config.get("z")
+
+    report = config.access_report()
+    assert report["hot"][0] == {"key": "y.a-b", "count": 2, "callers": {__name__: 2}}
+    assert {"key": "x", "count": 1, "callers": {__name__: 1}} in report["hot"]
+    assert sorted(m["key"] for m in report["misses"]) == ["missing", "y.nope"]
+    assert report["unread"] == ["y.c"]
+
+    recorder = config.stop_access_recording()
+    assert recorder is not None
+    config.get("x")
+    assert recorder.hits["x"] == 1
+
+
+def test_access_recording_sampling() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"x": 1})
+    recorder = config.start_access_recording(sample_every=4)
+    for _ in range(10):
+        config.get("x")
+    assert recorder.hits["x"] == 2
+    # recorders are not pickled with the config
+    assert cloudpickle.loads(cloudpickle.dumps(config))._access_recorder is None
+
+
+def test_normalize_keys(capsys: pytest.CaptureFixture[str]) -> None:
+    defaults = [{"x_y": {"a_b": 1, "c-d": 2}}]
+    config = Config(CONFIG_NAME, defaults=defaults, paths=[], env={ENV_PREFIX + "E_F": "3"}, normalize_keys=True)
+    assert config.config == {"x-y": {"a-b": 1, "c-d": 2}, "e-f": 3}
+    for key in ["x_y.a_b", "x-y.a-b", "x_y.a-b"]:
+        assert config.get(key) == 1
+    assert config.get("e_f") == 3
+    assert config.to_dict() == {"x_y": {"a_b": 1, "c-d": 2}, "e_f": 3}
+    assert deserialize(config.serialize()) == config.to_dict()
+    config.pprint()
+    assert "'a_b': 1" in capsys.readouterr()[0]
+
+    with config.set({"x_y": {"a-b": 4, "new_key": 5}}):
+        assert config.get("x-y.a_b") == 4
+        assert config.get("x-y.new-key") == 5
+        assert config.to_dict()["x_y"] == {"a_b": 4, "new_key": 5}
+    assert config.get("x_y") == {"a-b": 1, "c-d": 2}
+
+    with config.set(g_h__i_j=6):
+        assert config.config["g-h"] == {"i-j": 6}
+        assert config.to_dict()["g_h"] == {"i_j": 6}
+    assert "g-h" not in config.config
+    assert ("g-h",) not in config._spellings and ("g-h", "i-j") not in config._spellings
+    assert config._spellings[("x-y",)] == "x_y"
+
+    config.update({"x-y": {"a_b": 7}})
+    config.merge({"k_l": 8})
+    assert config.get("x_y.a_b") == 7
+    assert config.get("k-l") == 8
+
+    config.update_defaults({"x-y": {"c_d": 9}})
+    assert config.get("x_y.c_d") == 9
+
+    config.rename({"k_l": "m.n"})
+    assert "k_l" not in config
+    assert config.get("m.n") == 8
+
+    config.refresh()
+    assert config.to_dict() == {"x_y": {"a_b": 1, "c-d": 2}, "e_f": 3}
+
+
+def test_persistent_map() -> None:
+    from donfig._persistent import PersistentMap
+
+    a = PersistentMap({"x": 1, "y": {"a": 1}, "z": {"b": {"c": 2}}})
+    assert isinstance(a["y"], PersistentMap)
+    with pytest.raises(TypeError):
+        a["x"] = 2
+    with pytest.raises(TypeError):
+        a["y"].update({"a": 2})
+
+    b = a.set_in(["y", "a"], 2)
+    assert a["y"]["a"] == 1
+    assert b["y"]["a"] == 2
+    assert b["z"] is a["z"]
+    assert b.delete_in(["z", "b", "c"]) == {"x": 1, "y": {"a": 2}, "z": {"b": {}}}
+    assert b.delete_in(["missing", "key"]) is b
+    assert a.thaw() == {"x": 1, "y": {"a": 1}, "z": {"b": {"c": 2}}}
+    assert type(a.thaw()["y"]) is dict
+    assert cloudpickle.loads(cloudpickle.dumps(a)) == a
+
+
+def test_persistent_merge_shares_untouched_subtrees() -> None:
+    from donfig._persistent import PersistentMap
+
+    old = PersistentMap({"x": 1, "y": {"a": 1}, "z": {"b": 2}})
+    new = merge(old, {"y": {"c": 3}})
+    assert isinstance(new, PersistentMap)
+    assert new == {"x": 1, "y": {"a": 1, "c": 3}, "z": {"b": 2}}
+    assert new["z"] is old["z"]
+    assert old == {"x": 1, "y": {"a": 1}, "z": {"b": 2}}
+    assert update(old, {"x": 5}, priority="old") is old
+    assert update(old, {"y": {"a": 5}, "z": {}}, priority="old") is old
+
+
+def test_persistent_config(capsys: pytest.CaptureFixture[str]) -> None:
+    config = Config(CONFIG_NAME, defaults=[{"a": {"b": 1}}], paths=[], env={ENV_PREFIX + "C": "2"}, persistent=True)
+    assert config.get("a.b") == 1
+    assert config.to_dict() == {"a": {"b": 1}, "c": 2}
+    assert type(config.to_dict()["a"]) is dict
+    assert deserialize(config.serialize()) == {"a": {"b": 1}, "c": 2}
+
+    snapshot = config.snapshot()
+    with config.set({"a.b": 3, "d.e": 4, "c.f": 5}):
+        assert config.get("a.b") == 3
+        assert config.get("d.e") == 4
+        assert config.get("c.f") == 5
+        assert snapshot == {"a": {"b": 1}, "c": 2}
+    assert config.config == {"a": {"b": 1}, "c": 2}
+
+    config.update({"a": {"g": 6}})
+    config.merge({"h": 7})
+    config.update_defaults({"i": 8})
+    assert config.config == {"a": {"b": 1, "g": 6}, "c": 2, "h": 7, "i": 8}
+    config.rename({"h": "j.k"})
+    assert config.get("j.k") == 7
+    assert "h" not in config
+
+    config.restore(snapshot)
+    assert config.config is snapshot
+    config.clear()
+    assert config.config == {}
+    config.refresh()
+    assert config.config == {"a": {"b": 1}, "c": 2, "i": 8}
+    # only mappings are immutable, lists are shared with snapshots
+    before = config.snapshot()
+    config.set({"l": [1]})
+    snapshot = config.snapshot()
+    config.get("l").append(2)
+    assert snapshot["l"] == [1, 2]
+    config.restore(before)
+    config.pprint()
+    assert capsys.readouterr()[0] == "{'a': {'b': 1}, 'c': 2, 'i': 8}\n"
+
+
+def test_snapshot_restore_plain_config() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"a": {"b": 1}})
+    snapshot = config.snapshot()
+    config.set({"a.b": 2})
+    config.update({"c": 3})
+    assert snapshot == {"a": {"b": 1}}
+    root = config.config
+    config.restore(snapshot)
+    assert config.config is root
+    assert config.config == {"a": {"b": 1}}
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_prepare_set(persistent: bool) -> None:
+    import threading
+
+    config = Config(CONFIG_NAME, paths=[], env={}, persistent=persistent)
+    config.update({"x-y": {"a": 1}, "b": 2})
+    patch = config.prepare_set({"x_y.a": 3, "c.d": 4}, b=5, e__f=6)
+    assert config.config == {"x-y": {"a": 1}, "b": 2}
+
+    for _ in range(3):
+        with patch as c:
+            assert c is config.config
+            assert config.config == {"x-y": {"a": 3}, "b": 5, "c": {"d": 4}, "e": {"f": 6}}
+            with patch:
+                assert config.get("x_y.a") == 3
+            assert config.get("c.d") == 4
+        assert config.config == {"x-y": {"a": 1}, "b": 2}
+
+    with config.set(b=7), patch:
+        assert config.get("b") == 5
+    assert config.get("b") == 2
+
+    # every thread rolls back its own entry
+    entered, release = threading.Event(), threading.Event()
+
+    def enter() -> None:
+        with patch:
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=enter)
+    thread.start()
+    entered.wait(5)
+    with pytest.raises(RuntimeError, match="not entered"):
+        patch.__exit__(None, None, None)
+    assert config.get("b") == 5
+    release.set()
+    thread.join()
+    assert config.config == {"x-y": {"a": 1}, "b": 2}
+
+
+def test_prepare_set_deprecations_and_normalized_keys() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={}, deprecations={"old": "new.key", "gone": None}, normalize_keys=True)
+    with pytest.warns(Warning, match="new.key"):
+        patch = config.prepare_set(old=1, some_key=2)
+    with patch:
+        assert config.get("new.key") == 1
+        assert config.get("some-key") == 2
+        assert config.to_dict() == {"new": {"key": 1}, "some_key": 2}
+    assert config.config == {}
+    # spellings are registered while the patch is active only, also after a refresh
+    assert ("some-key",) not in config._spellings
+    patch = config.prepare_set({"Foo_Bar.x_y": 1, "z": {"a_b": 1}})
+    config.refresh()
+    with patch:
+        assert config.to_dict() == {"Foo_Bar": {"x_y": 1}, "z": {"a_b": 1}}
+    assert config._spellings == {}
+
+    with pytest.raises(ValueError):
+        config.prepare_set(gone=1)
+
+
+def test_to_dict_copies_leaves() -> None:
+    import threading
+
+    lock = threading.Lock()
+    leaf = OrderedDict(a=[1, 2])
+    test_config = Config(CONFIG_NAME)
+    test_config.config = {"x": [1, {"y": (2, [3])}], "leaf": leaf}
+
+    d = test_config.to_dict()
+    assert d == test_config.config
+    assert d["x"] is not test_config.config["x"]
+    assert d["x"][1]["y"][1] is not test_config.config["x"][1]["y"][1]
+    assert type(d["leaf"]) is OrderedDict
+    assert d["leaf"] is not leaf
+    assert d["leaf"]["a"] is not leaf["a"]
+
+    # not deep-copyable
+    test_config.config["lock"] = [lock]
+    shallow = test_config.to_dict(shallow_leaves=True)
+    assert shallow == test_config.config
+    assert shallow["x"] is not test_config.config["x"]
+    assert shallow["leaf"] is leaf
+    assert shallow["lock"][0] is lock
+
+
+def test_copy_tree_self_reference() -> None:
+    from donfig._tree import copy_tree
+
+    data: dict[str, Any] = {"a": [1]}
+    data["a"].append(data)
+    copied = copy_tree(data)
+    assert copied is not data
+    assert copied["a"][1] is copied
+
+
+def test_expand_environment_variables_lazy(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("FOO", "foo")
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"a": "$FOO/x", "b": {"c": ["${FOO}", 1], "d": "plain"}, "e": 1})
+    config.expand_environment_variables(lazy=True)
+
+    assert config.get("a") == "foo/x"
+    assert config["b"] == {"c": ["foo", 1], "d": "plain"}
+    assert config.get("b.d") == "plain"
+    assert config.get("e") == 1
+    # templates are kept in the configuration itself
+    assert config.config["a"] == "$FOO/x"
+    assert config.to_dict()["b"]["c"] == ["${FOO}", 1]
+
+    monkeypatch.setenv("FOO", "bar")
+    assert config.get("a") == "bar/x"
+    with config.set(f="$FOO"):
+        assert config.get("f") == "bar"
+
+    # subtrees without templates are known from the scan and not walked
+    config.update({"g": {"h": {"i": 1}}})
+    assert config.get("g") is config.config["g"]
+    with config.set({"g.h.j": "${FOO}"}):
+        assert config.get("g") == {"h": {"i": 1, "j": "bar"}}
+    expander = config._env_expander
+    assert expander is not None
+    expander.maxsize = 2
+    for i in range(5):
+        config.update({"k": f"$FOO{i}"})
+        config.get("k")
+    assert len(expander._cache) == 2
+
+    config.refresh()
+    assert "a" not in config
+    config.expand_environment_variables()
+    assert config._env_expander is None
+
+
+def test_collect_yaml_lazy(tmpdir: Any) -> None:
+    from donfig._lazy import LazyDict
+
+    with open(os.path.join(tmpdir, "a.yaml"), "w") as f:
+        f.write("base: &b\n  x: 1\n  y: [1, 2]\nother:\n  <<: *b\n  z: 3\nscalar: 1\n")
+    with open(os.path.join(tmpdir, "b.yaml"), "w") as f:
+        f.write("other:\n  x: 2\nnew:\n  k: v\n")
+    defaults = [{"base": {"x": 0, "w": 0}}]
+
+    eager = Config(CONFIG_NAME, defaults=defaults, paths=[str(tmpdir)], env={})
+    config = Config(CONFIG_NAME, defaults=defaults, paths=[str(tmpdir)], env={}, lazy_load=True)
+    new = config.config["new"]
+    assert type(new) is LazyDict and new.is_lazy
+    assert config.get("new.k") == "v"
+    new = config.config["new"]
+    assert not new.is_lazy
+    assert config.config == eager.config
+    assert config.to_dict() == eager.to_dict()
+    assert type(config.to_dict()["new"]) is dict
+
+    # sections are constructed independently for every merge
+    configs = collect_yaml(paths=[str(tmpdir)], lazy=True)
+    assert merge(*configs)["new"] is not configs[1]["new"]
+    assert merge(*configs) == merge(*collect_yaml(paths=[str(tmpdir)]))
+
+    # sections that fail to construct report the file like eager loading does
+    bad = os.path.join(tmpdir, "c.yaml")
+    with open(bad, "w") as f:
+        f.write("bad:\n  x: !!python/name:os.system\n")
+    config = Config(CONFIG_NAME, paths=[bad], env={}, lazy_load=True)
+    with pytest.raises(ValueError, match="c.yaml.* is malformed"):
+        config.get("bad.x")
+    with pytest.raises(ValueError, match="c.yaml.* is malformed"):
+        Config(CONFIG_NAME, paths=[bad], env={})
+
+
+def test_collect_yaml_caches_search_paths(tmpdir: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    from donfig import _cache, clear_caches
+
+    missing = os.path.join(tmpdir, "missing")
+    assert collect_yaml(paths=[missing]) == []
+    os.mkdir(missing)
+    with open(os.path.join(missing, "a.yaml"), "w") as f:
+        f.write("x: 1\n")
+    # still remembered as missing
+    assert collect_yaml(paths=[missing]) == []
+    clear_caches()
+    assert collect_yaml(paths=[missing]) == [{"x": 1}]
+
+    scans = []
+    scandir = os.scandir
+
+    def counting_scandir(path: str) -> Any:
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    monkeypatch.setattr(_cache, "_SETTLE_NS", 0)
+    assert collect_yaml(paths=[missing]) == [{"x": 1}]
+    assert collect_yaml(paths=[missing]) == [{"x": 1}]
+    assert len(scans) == 1
+    with open(os.path.join(missing, "b.yml"), "w") as f:
+        f.write("y: 2\n")
+    assert collect_yaml(paths=[missing]) == [{"x": 1}, {"y": 2}]
+    assert len(scans) == 2
+
+
+def test_ensure_file_visible_to_refresh(tmpdir: Any) -> None:
+    source = os.path.join(tmpdir, "source.yaml")
+    with open(source, "w") as f:
+        f.write("x: 1\n")
+    destination = os.path.join(tmpdir, "dest")
+    config = Config(CONFIG_NAME, paths=[destination], env={})
+    assert config.config == {}
+    config.ensure_file(source=source, destination=destination, comment=False)
+    config.refresh()
+    assert config.get("x") == 1
+
+
+def test_collect_yaml_shares_parsed_files(tmpdir: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    import donfig.config_obj
+    from donfig import _cache, clear_caches, file_cache_info
+
+    monkeypatch.setattr(_cache, "_SETTLE_NS", -1)
+    path = os.path.join(tmpdir, "a.yaml")
+    with open(path, "w") as f:
+        f.write("x: [1, 2]\ny:\n  z: 1\n")
+    clear_caches()
+
+    a = Config(CONFIG_NAME, paths=[path], env={})
+    b = Config(CONFIG_NAME, paths=[path], env={})
+    assert file_cache_info()[:2] == (1, 1)
+    a.config["x"].append(3)
+    a.config["y"]["z"] = 2
+    b.refresh()
+    assert b.config == {"x": [1, 2], "y": {"z": 1}}
+    assert file_cache_info().hits == 2
+
+    # lazy results are cached separately and stay lazy
+    lazy = Config(CONFIG_NAME, paths=[path], env={}, lazy_load=True)
+    lazy.refresh()
+    assert file_cache_info()[1:] == (2, 128, 2)
+    assert lazy.config == b.config
+
+    with open(path, "w") as f:
+        f.write("x: 1\n")
+    b.refresh()
+    assert b.config == {"x": 1}
+
+    monkeypatch.setattr(_cache, "FILE_CACHE_SIZE", 1)
+    with open(path, "w") as f:
+        f.write("x: 10\n")
+    b.refresh()
+    assert b.config == {"x": 10}
+    assert file_cache_info().currsize == 1
+
+    # nothing is copied when the parsed file is not cached
+    monkeypatch.setattr(_cache, "FILE_CACHE_SIZE", 0)
+    copies: list[Any] = []
+
+    def counting_copy_parsed(config: Any) -> Any:
+        copies.append(config)
+        return _cache.copy_parsed(config)
+
+    monkeypatch.setattr(donfig.config_obj, "copy_parsed", counting_copy_parsed)
+    with open(path, "w") as f:
+        f.write("x: 11\n")
+    b.refresh()
+    assert b.config == {"x": 11}
+    assert copies == []
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_fingerprint(persistent: bool) -> None:
+    config = Config(CONFIG_NAME, paths=[], env={}, persistent=persistent)
+    config.update({"a": {"b": 1, "c": [1, 2]}, "d": {"e": "x"}})
+    # changes skip the digest cache until a fingerprint is taken
+    assert not config._digests._used
+
+    def assert_up_to_date() -> None:
+        other = Config(CONFIG_NAME, paths=[], env={})
+        other.update(config.to_dict())
+        assert config.fingerprint() == other.fingerprint()
+        assert config.fingerprint("a") == other.fingerprint("a")
+
+    full, a, d = config.fingerprint(), config.fingerprint("a"), config.fingerprint("d")
+    assert len({full, a, d}) == 3
+    with config.set({"a.b": 2}):
+        assert config.fingerprint() != full
+        assert config.fingerprint("a") != a
+        assert config.fingerprint("d") == d
+        assert_up_to_date()
+    assert (config.fingerprint(), config.fingerprint("a")) == (full, a)
+    with config.prepare_set(a__c=[1]):
+        assert config.fingerprint("a") != a
+    assert config.fingerprint("a") == a
+
+    config.update({"d": {"f": 1}})
+    assert config.fingerprint("d") != d
+    assert config.fingerprint("a") == a
+    assert_up_to_date()
+    assert config.fingerprint("a.c") != config.fingerprint("a.b")
+    with pytest.raises(KeyError):
+        config.fingerprint("a.missing")
+
+    config.config = {"a": {"b": 1, "c": [1, 2]}, "d": {"e": "x"}}
+    assert config.fingerprint() == full
+    config.refresh()
+    assert config.fingerprint() == Config(CONFIG_NAME, paths=[], env={}).fingerprint()
+    assert cloudpickle.loads(cloudpickle.dumps(config)).fingerprint() == config.fingerprint()
+
+
+def test_memoize() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"array": {"chunk-size": 10, "other": 1}, "scheduler": {"name": "a"}, "unrelated": 1})
+    calls = []
+
+    @config.memoize(keys=["array.chunk_size", "scheduler"], maxsize=4)
+    def plan(n: int, scale: int = 1) -> tuple[int, str]:
+        calls.append(n)
+        return n * config.get("array.chunk-size") * scale, config.get("scheduler.name")
+
+    assert plan(2) == plan(2) == (20, "a")
+    assert plan(2, scale=2) == (40, "a")
+    assert calls == [2, 2]
+    config.update({"unrelated": 2, "array": {"other": 2}})
+    assert plan(2) == (20, "a")
+    assert len(calls) == 2
+
+    with config.set({"array.chunk-size": 100}):
+        assert plan(2) == (200, "a")
+    assert plan(2) == (20, "a")
+    with config.set({"scheduler.name": "b"}):
+        assert plan(2) == (20, "b")
+    assert len(calls) == 4
+    # results under both states are kept
+    with config.set({"array.chunk-size": 100}):
+        assert plan(2) == (200, "a")
+    assert len(calls) == 4
+
+    config.refresh()
+    with pytest.raises(KeyError):
+        plan(2)
+    config.update({"array": {"chunk-size": 1}, "scheduler": {"name": "c"}})
+    assert [plan(n) for n in range(5)] == [(n, "c") for n in range(5)]
+    assert plan.cache_info().currsize == 4
+    plan.cache_clear()
+    assert plan.cache_info() == (0, 0, 4, 0)
+
+
+def test_memoize_ignores_results_computed_during_changes() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"x": 1})
+
+    @config.memoize(keys=["x"])
+    def read() -> int:
+        value: int = config.get("x")
+        # the configuration changes while the result is computed
+        config.update({"x": value + 1})
+        return value
+
+    assert read() == 1
+    assert read() == 2
+    assert read.cache_info().currsize == 0
+
+
+def test_derive() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.update({"worker": {"memory-limit": "2 GiB", "threads": 2}, "other": 1})
+    calls = []
+
+    def parse_bytes(text: str) -> int:
+        calls.append(text)
+        number, unit = text.split()
+        return int(number) * {"MiB": 2**20, "GiB": 2**30}[unit]
+
+    config.derive("worker.memory-bytes", parse_bytes, depends_on=["worker.memory_limit"])
+    config.derive("worker.memory-per-thread", lambda total, n: total // n, ["worker.memory-bytes", "worker.threads"])
+    assert config.get("worker.memory-per-thread") == 2**30
+    assert config["worker.memory_bytes"] == config.get("worker.memory-bytes") == 2**31
+    assert "memory-bytes" not in config.get("worker")
+    config.update({"other": 2, "worker": {"threads": 4}})
+    assert config.get("worker.memory-per-thread") == 2**29
+    assert calls == ["2 GiB"]
+
+    @config.memoize(keys=["worker.memory-bytes"])
+    def half() -> int:
+        value: int = config.get("worker.memory-bytes")
+        return value // 2
+
+    assert half() == 2**30
+    with config.set({"worker.memory-limit": "512 MiB"}):
+        assert config.get("worker.memory-per-thread") == 2**27
+        assert half() == 2**28
+    assert config.get("worker.memory-per-thread") == 2**29
+    assert half() == 2**30
+    assert calls == ["2 GiB", "512 MiB", "2 GiB"]
+    # recomputed values are not changes of the stored configuration
+    assert config._overrides is not None
+    assert not {p for p in config._overrides if p[-1] in ("memory-bytes", "memory-per-thread")}
+
+    copied = cloudpickle.loads(cloudpickle.dumps(config))
+    assert copied.get("worker.memory-per-thread") == 2**29
+
+    config.refresh()
+    assert config.get("worker.memory-bytes", 0) == 0
+    with pytest.raises(KeyError):
+        config.get("worker.memory-per-thread")
+
+
+def test_derive_cycles() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.derive("a.x", lambda b: b, depends_on=["b.y"])
+    config.derive("b.y", lambda c: c, depends_on=["c"])
+    with pytest.raises(ValueError, match="c -> a.x -> b.y -> c"):
+        config.derive("c", lambda a: a, depends_on=["a.x"])
+    with pytest.raises(ValueError, match="itself"):
+        config.derive("d.e", lambda d: d, depends_on=["d"])
+    config.derive("c", lambda d: d, depends_on=["d"])
+    assert "c" not in config
+    config.update({"d": 1})
+    assert config.get("a.x") == 1
+
+
+def test_arefresh(tmpdir: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    import asyncio
+    import threading
+
+    data = {f"s{i}": {f"k{j}": {"values": list(range(10)), "name": "x"} for j in range(20)} for i in range(10)}
+    for i in range(4):
+        with open(os.path.join(tmpdir, f"{i}.yaml"), "w") as f:
+            yaml.dump({f"file{i}": data}, f)
+    config = Config(CONFIG_NAME, paths=[], env={})
+    expected = config.collect(paths=[str(tmpdir)])
+
+    # collecting waits for a task of the event loop, which only runs if the loop is not blocked
+    started, proceed = threading.Event(), threading.Event()
+    collect = config.collect
+
+    def blocking_collect(*args: Any, **kwargs: Any) -> dict[str, Any]:
+        started.set()
+        assert proceed.wait(5), "the event loop was blocked"
+        proceed.clear()
+        return collect(*args, **kwargs)
+
+    monkeypatch.setattr(config, "collect", blocking_collect)
+
+    async def release() -> None:
+        while not started.wait(0):
+            await asyncio.sleep(0.001)
+        started.clear()
+        proceed.set()
+
+    async def main() -> None:
+        waiter = asyncio.create_task(config.wait_for_refresh())
+        await asyncio.sleep(0)
+        task = asyncio.create_task(release())
+        assert await config.acollect(paths=[str(tmpdir)]) == expected
+        await task
+        assert not waiter.done()
+        task = asyncio.create_task(release())
+        await config.arefresh(paths=[str(tmpdir)])
+        await task
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(main())
+    assert config.config == expected
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"normalize_keys": True}, {"lock_stripe_depth": 1}])
+def test_set_waiting_for_refresh(kwargs: dict[str, Any]) -> None:
+    import threading
+    import time
+
+    config = Config(CONFIG_NAME, paths=[], env={}, defaults=[{"a": 1}], **kwargs)
+    thread = threading.Thread(target=config.set, args=({"b": 2},))
+    with config._locked():
+        thread.start()
+        time.sleep(0.05)
+        # what a refresh does while the set waits for the lock
+        config.config = config._build("refresh")[0]
+    thread.join()
+    assert config.get("b", "LOST") == 2
+    assert config.get("a") == 1
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is not available")
+def test_reload_on_signal(tmpdir: Any, caplog: pytest.LogCaptureFixture) -> None:
+    path = os.path.join(tmpdir, "a.yaml")
+    with open(path, "w") as f:
+        f.write("x: 1\ny: 1\n")
+    config = Config(CONFIG_NAME, paths=[path], env={})
+    reloader = config.reload_on_signal()
+    try:
+        with open(path, "w") as f:
+            f.write("x: 2\ny: 1\nz: 1\n")
+        with caplog.at_level(logging.INFO, logger="donfig.reload"), config.set(w=1):
+            # the reload waits for nothing but the final swap
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert reloader.wait(timeout=5)
+        assert config.config == {"x": 2, "y": 1, "z": 1}
+        assert reloader.last_reload is not None
+        assert reloader.last_reload["changed"] == 3
+        assert "3 keys changed" in caplog.text
+
+        with open(path, "w") as f:
+            f.write("{")
+        reloader.trigger()
+        assert reloader.wait(timeout=5)
+        assert "malformed" in reloader.last_reload["error"]
+        assert config.config == {"x": 2, "y": 1, "z": 1}
+    finally:
+        reloader.stop()
+    assert signal.getsignal(signal.SIGHUP) is signal.SIG_DFL
+
+
+def test_reload_count_changes() -> None:
+    from donfig._lazy import LazyDict
+    from donfig._reload import count_changes
+
+    sections = LazyDict(dict), LazyDict(dict)
+    old = {"a": {"b": 1, "c": {"d": 1}}, "e": 1, "f": {"g": 1}, "lazy": sections[0]}
+    new = {"a": {"b": 1, "c": {"d": 2, "h": 1}}, "e": {"i": 1, "j": 2}, "f": 1, "lazy": sections[1]}
+    assert count_changes(old, new) == 7
+    assert all(section.is_lazy for section in sections)
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix domain sockets are not available")
+def test_config_server(tmpdir: Any) -> None:
+    from donfig.server import ConfigServer, ServerSource
+
+    served = Config(CONFIG_NAME, paths=[], env={}, defaults=[{"a": {"b": 1, "c": [1, 2]}, "d": 1}])
+    path = os.path.join(tmpdir, "config.sock")
+    with ConfigServer(served, path):
+        source = ServerSource(path)
+        client = Config(CONFIG_NAME, paths=[], env={ENV_PREFIX + "D": "2"}, sources=[source])
+        # environment variables override the served configuration
+        assert client.config == {"a": {"b": 1, "c": [1, 2]}, "d": 2}
+        assert source.generation == 0
+        # only the owner can connect
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+        # values changed in the client survive the changes pushed by the server
+        client.update({"g": 1})
+        with client.set({"a.c": [3]}):
+            served.set({"a.b": 5, "e": {"f": 1}})
+            assert source.wait_for_generation(1, timeout=5)
+            assert client.get("a.b") == 5
+            assert client.get("e.f") == 1
+            assert client.get("a.c") == [3]
+            assert client.get("g") == 1
+        assert client.get("a.c") == [1, 2]
+        # values set temporarily are not kept once they were rolled back
+        served.set({"a.c": [7]})
+        assert source.wait_for_generation(2, timeout=5)
+        assert client.get("a.c") == [7]
+
+        served.refresh()
+        assert source.wait_for_generation(3, timeout=5)
+        assert client.config == {"a": {"b": 1, "c": [1, 2]}, "d": 2, "g": 1}
+
+        other = Config(CONFIG_NAME, paths=[], env={}, sources=[ServerSource(path)])
+        assert other.config == served.config
+        other.sources[0].close()
+
+    # the last known configuration is kept when the server goes away
+    client.refresh()
+    assert client.get("a.b") == 1
+    source.close()
+    assert not os.path.exists(path)
+
+
+def test_config_server_failures(tmpdir: Any, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    import time
+
+    from donfig.server import ConfigServer, ServerSource
+
+    served = Config(CONFIG_NAME, paths=[], env={}, defaults=[{"a": 0}])
+    path = os.path.join(tmpdir, "config.sock")
+    with ConfigServer(served, path, send_timeout=0.2):
+        # a client that never reads is dropped instead of blocking everyone else
+        idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        idle.connect(path)
+        source = ServerSource(path, timeout=2)
+        client = Config(CONFIG_NAME, paths=[], env={}, sources=[source])
+        for i in range(1, 31):
+            served.set({"a": i, "big": str(i) * 100_000})
+            time.sleep(0.01)
+        for _ in range(500):
+            if client.get("a") == 30:
+                break
+            time.sleep(0.01)
+        assert client.get("a") == 30
+        other = Config(CONFIG_NAME, paths=[], env={}, sources=[ServerSource(path, timeout=2)])
+        assert other.get("a") == 30
+        other.sources[0].close()
+        idle.close()
+
+        # a change that can not be applied is logged and the client starts over on the next load
+        def fail(*args: Any) -> Any:
+            raise RuntimeError("broken")
+
+        monkeypatch.setattr(client, "_build", fail)
+        served.set({"a": 31})
+        for _ in range(500):
+            if source._socket is None:
+                break
+            time.sleep(0.01)
+        assert source._socket is None
+        assert "Could not apply the configuration" in caplog.text
+        monkeypatch.undo()
+        served.set({"a": 32})
+        client.refresh()
+        assert client.get("a") == 32
+        source.close()
+
+
+def test_sqlite_source(tmpdir: Any) -> None:
+    from donfig._lazy import LazyDict
+    from donfig.sources import SQLiteSource, compile_config_db
+
+    with open(os.path.join(tmpdir, "a.yaml"), "w") as f:
+        f.write("a:\n  b: 1\n  c: {d: [1, 2], e: {}}\nf: 1\ng: {}\n")
+    with open(os.path.join(tmpdir, "b.yaml"), "w") as f:
+        f.write("a:\n  b: 2\nh:\n  i: x\n")
+    database = os.path.join(tmpdir, "config.db")
+    assert compile_config_db([str(tmpdir)], database) == 6
+
+    eager = Config(CONFIG_NAME, paths=[str(tmpdir)], env={})
+    source = SQLiteSource(database)
+    config = Config(CONFIG_NAME, paths=[], env={ENV_PREFIX + "H__J": "1"}, sources=[source])
+    section = config.config["a"]
+    assert type(section) is LazyDict and section.is_lazy
+    assert config.get("a.c.d") == [1, 2]
+    section = config.config["a"]
+    assert not section.is_lazy
+    assert config.get("h") == {"i": "x", "j": 1}
+    with config.set({"a.b": 3}):
+        assert config.get("a.b") == 3
+    config.config["h"].pop("j")
+    assert config.to_dict() == eager.to_dict()
+
+    assert cloudpickle.loads(cloudpickle.dumps(config)).to_dict() == eager.to_dict()
+
+    # only the mappings along the path of a key are fetched
+    with open(os.path.join(tmpdir, "c.yaml"), "w") as f:
+        yaml.dump({"big": {f"k{i}": {"v": i} for i in range(100)}}, f, sort_keys=False)
+    assert compile_config_db([str(tmpdir)], database) == 106
+    config.refresh()
+    assert config.get("big.k1.v") == 1
+    big = config.config["big"]
+    children = (big["k1"], big["k2"])
+    assert not children[0].is_lazy and children[1].is_lazy
+    assert list(big) == [f"k{i}" for i in range(100)]
+    os.remove(os.path.join(tmpdir, "c.yaml"))
+
+    # a replaced database is read on the next refresh
+    with open(os.path.join(tmpdir, "b.yaml"), "w") as f:
+        f.write("z:\n  q: 1\n")
+    assert compile_config_db([str(tmpdir)], database) == 6
+    config.refresh()
+    assert config.get("a.b") == 1
+    assert config.get("z.q") == 1
+    source.close()
+
+    missing = Config(CONFIG_NAME, paths=[], env={}, sources=[SQLiteSource(os.path.join(tmpdir, "missing.db"))])
+    assert missing.config == {}
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_pickle_compact(tmpdir: Any, persistent: bool) -> None:
+    import gc
+    import pickle
+
+    path = os.path.join(tmpdir, "a.yaml")
+    with open(path, "w") as f:
+        f.write("a:\n  b: 1\n  c: 2\nx: [1, 2]\n")
+    env = {ENV_PREFIX + "E": "3", "UNRELATED": "x" * 10000}
+    kwargs: dict[str, Any] = {"paths": [str(tmpdir)], "env": env, "persistent": persistent}
+    config = Config(CONFIG_NAME, defaults=[{"d": {"e": 1}}], pickle_mode="compact", **kwargs)
+    config.set({"a.b": 10, "n": {"m": 1}})
+    config.update({"d": {"f": 2}})
+    with config.set({"a.new": 1}):
+        pass
+    with config.set({"x": 1}):
+        data = pickle.dumps(config)
+        copied = pickle.loads(data)
+        assert copied.to_dict() == config.to_dict()
+    assert copied.env == {ENV_PREFIX + "E": "3"}
+    assert copied.defaults == config.defaults
+    config.pickle_mode = "full"
+    assert len(data) < len(pickle.dumps(config)) / 5
+    config.pickle_mode = "compact"
+
+    # everything is sent after changes that can not be tracked
+    config.clear()
+    config.update({"only": 1})
+    assert pickle.loads(pickle.dumps(config)).to_dict() == {"only": 1}
+
+    # the receiver reads different files
+    config.refresh()
+    data = pickle.dumps(config)
+    with open(path, "w") as f:
+        f.write("a:\n  b: 5\n")
+    with pytest.raises(ValueError, match="files or sources differ"):
+        pickle.loads(data)
+
+    # the receiver does not know the defaults
+    del config, copied
+    gc.collect()
+    with pytest.raises(ValueError, match="same defaults"):
+        pickle.loads(data)
+
+
+def test_executor_initializer(monkeypatch: pytest.MonkeyPatch) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+
+    parent = Config(CONFIG_NAME, paths=[], env={})
+    parent.set({"a": {"b": 1, "c": 2}, "o": OrderedDict(k=1)})
+    initializer = parent.executor_initializer()
+    initargs = parent.as_initargs()
+    generation = initargs[-1]
+    assert parent.delta_since(generation) == (generation, generation, [], [])
+    with ProcessPoolExecutor(1, initializer=initializer, initargs=initargs) as pool:
+        assert pool.submit(os.getenv, ENV_PREFIX + "_INTERNAL_INHERIT_CONFIG").result() == initargs[2]
+
+    # in the worker, for configurations existing before and created after the initializer ran
+    monkeypatch.delenv(ENV_PREFIX + "_INTERNAL_INHERIT_CONFIG", raising=False)
+    existing = Config(CONFIG_NAME, paths=[], env={})
+    initializer(*initargs)
+    created = Config(CONFIG_NAME, paths=[], defaults=[{"x": 1}])
+    assert existing.get("a") == created.get("a") == {"b": 1, "c": 2}
+
+    parent.set({"a.b": 10, "d": 1})
+    delta = parent.delta_since(generation)
+    assert delta.generation == parent.generation > generation
+    assert parent.delta_since(generation) is delta
+    created.apply_delta(delta)
+    assert created.get("a.b") == 10 and created.get("d") == 1
+    created.apply_delta(delta)
+    assert created.get("a.b") == 10
+
+    # newer deltas replace older ones
+    parent.config["a"].pop("c")
+    parent.config["o"]["k"] = 2
+    parent.set({"d": 2, "a.b": 1})
+    created.apply_delta(parent.delta_since(generation))
+    assert created.get("a") == {"b": 1}
+    assert created.get("d") == 2 and created.get("x") == 1
+    assert created.get("o.k") == 2
+
+    # older deltas arriving late are ignored
+    created.apply_delta(delta)
+    assert created.get("d") == 2
+
+    with pytest.raises(ValueError, match="was not sent"):
+        parent.delta_since(parent.generation)
+
+
+def test_subprocess_env() -> None:
+    config = Config(CONFIG_NAME, paths=[], env={})
+    config.set({"a": {"b": 1}})
+    var = ENV_PREFIX + "_INTERNAL_INHERIT_CONFIG"
+    env = config.subprocess_env({"PATH": "/bin"})
+    assert env == {"PATH": "/bin", var: config.serialize()}
+    assert config.subprocess_env()[var] is env[var]
+    assert "PATH" in config.subprocess_env()
+
+    config.set({"a.b": 2})
+    envs = config.subprocess_envs([{"N": "1"}, {"N": "2"}], base={})
+    assert [e["N"] for e in envs] == ["1", "2"]
+    assert envs[0][var] is envs[1][var] == config.serialize() != env[var]
+
+    config.config = {"replaced": 1}
+    assert deserialize(config.subprocess_env({})[var]) == {"replaced": 1}
+
+
+def test_collect_env_decodes_inherited_config_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    import donfig.config_obj
+    from donfig import clear_caches
+
+    calls = []
+
+    def counting_deserialize(data: str) -> Any:
+        calls.append(data)
+        return deserialize(data)
+
+    monkeypatch.setattr(donfig.config_obj, "deserialize", counting_deserialize)
+    clear_caches()
+    env = {ENV_PREFIX + "_INTERNAL_INHERIT_CONFIG": serialize({"a": {"b": [1, 2]}})}
+    first = Config(CONFIG_NAME, paths=[], env=env)
+    first.config["a"]["b"].append(3)
+    second = Config(CONFIG_NAME, paths=[], env=env)
+    second.refresh()
+    assert second.get("a.b") == [1, 2]
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("depth", [1, 2])
+def test_lock_striping(depth: int) -> None:
+    import threading
+
+    config = Config(CONFIG_NAME, paths=[], env={}, lock_stripe_depth=depth)
+    config.set({"logging": {"level": {"x": 1}}, "scheduler": {"work_stealing": {"y": 1}}})
+
+    def set_in_thread(arg: dict[str, Any]) -> threading.Thread:
+        thread = threading.Thread(target=config.set, args=(arg,))
+        thread.start()
+        thread.join(0.2)
+        return thread
+
+    with config._locked([["logging", "level", "x"]]):
+        # other subtrees are not blocked, whatever their spelling
+        assert not set_in_thread({"scheduler.work-stealing.y": 2}).is_alive()
+        same = set_in_thread({"logging.level.z": 2})
+        assert same.is_alive()
+        refresh = threading.Thread(target=config.refresh)
+        refresh.start()
+        refresh.join(0.2)
+        assert refresh.is_alive()
+    same.join()
+    refresh.join()
+    assert config.config == {}
+
+    with config._locked([["logging", "level"]]):
+        # a missing intermediate mapping needs the whole configuration
+        thread = set_in_thread({"new.key": 1})
+        assert thread.is_alive() == (depth > 1)
+    thread.join()
+
+    stripe = config._stripe(("logging",) * depth)
+    assert stripe.token.startswith(config.config_lock.token + ":")
+    copied = cloudpickle.loads(cloudpickle.dumps(config))
+    assert copied._stripe(("logging",) * depth).lock is stripe.lock
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"persistent": True}, {"lock_stripe_depth": 1}])
+def test_concurrent_readers_and_writers(kwargs: dict[str, Any]) -> None:
+    import threading
+
+    from donfig._lock import SerializableLock
+
+    config = Config(CONFIG_NAME, paths=[], env={}, defaults=[{"a": {"x": 0}, "b": {"y": 0}}], **kwargs)
+    errors: list[BaseException] = []
+    start = threading.Barrier(6)
+    tokens = [str(i) for i in range(50)]
+
+    def guard(func: Any) -> Any:
+        def run(*args: Any) -> None:
+            try:
+                start.wait()
+                func(*args)
+            except BaseException as exc:  # pragma: no cover
+                errors.append(exc)
+
+        return run
+
+    @guard
+    def write(key: str) -> None:
+        for i in range(300):
+            # refresh may drop the value at any time, it is removed again on exit either way
+            with config.set({f"{key}.{key * 2}": i}):
+                pass
+
+    refreshed = threading.Event()
+
+    @guard
+    def read() -> None:
+        # keep reading until the refreshes are done, a partly built configuration must never be seen
+        n = 0
+        while n < 1000 or not refreshed.is_set():
+            root = config.config
+            assert root["a"]["x"] == 0 and root["b"]["y"] == 0
+            assert config.get("a.x") == 0
+            assert config.get("b.y") == 0
+            n += 1
+
+    @guard
+    def refresh() -> None:
+        try:
+            for _ in range(50):
+                config.refresh()
+        finally:
+            refreshed.set()
+
+    @guard
+    def locks() -> None:
+        for token in tokens:
+            SerializableLock(token)
+
+    threads = [threading.Thread(target=write, args=(k,)) for k in "ab"]
+    threads += [threading.Thread(target=read), threading.Thread(target=refresh)]
+    threads += [threading.Thread(target=locks) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert config.to_dict() == {"a": {"x": 0}, "b": {"y": 0}}
+    assert len({SerializableLock(token).lock for token in tokens}) == len(tokens)
+
+
+def test_memory_compaction(tmpdir: Any) -> None:
+    from donfig._lock import SerializableLock
+
+    for name in "ab":
+        with open(os.path.join(tmpdir, f"{name}.yaml"), "w") as f:
+            f.write(f"{name}-section:\n  shared-key-xyz: [{'value-' * 20}, 1.5, -0.0, 0.0]\n")
+    files = collect_yaml([str(tmpdir)])
+    key_a, key_b = (next(iter(f[f"{n}-section"])) for f, n in zip(files, "ab", strict=True))
+    assert key_a is key_b
+    lazy = collect_yaml([str(tmpdir)], lazy=True)
+    assert next(iter(lazy[0]["a-section"])) is key_a
+
+    plain = Config(CONFIG_NAME, paths=[str(tmpdir)], env={})
+    deduped = Config(CONFIG_NAME, paths=[str(tmpdir)], env={}, dedupe_values=True)
+    assert deduped.to_dict() == plain.to_dict()
+    a, b = deduped.get("a-section.shared-key-xyz"), deduped.get("b-section.shared-key-xyz")
+    assert a[0] is b[0] and a[1] is b[1]
+    assert str(a[2]) == "-0.0" and str(a[3]) == "0.0"
+
+    usage = plain.memory_usage()
+    assert set(usage) == {"a-section", "b-section"}
+    assert sum(deduped.memory_usage().values()) < sum(usage.values())
+    assert list(plain.memory_usage("a-section")) == ["a-section.shared-key-xyz"]
+    leaf = plain.memory_usage("a-section.shared-key-xyz")
+    assert list(leaf) == ["a-section.shared-key-xyz"]
+    assert 0 < leaf["a-section.shared-key-xyz"] < usage["a-section"]
+
+    normalized = Config(CONFIG_NAME, paths=[str(tmpdir)], env={}, normalize_keys=True)
+    assert list(normalized.memory_usage("a_section")) == ["a_section.shared-key-xyz"]
+
+    assert not hasattr(plain.set({}), "__dict__")
+    assert not hasattr(SerializableLock(), "__dict__")
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"persistent": True}, {"normalize_keys": True}])
+def test_iter_flat_and_dump(kwargs: dict[str, Any]) -> None:
+    import io
+
+    defaults: dict[str, Any] = {"a": {"b_c": 1, "d": {"e": [1, {"f": None}], "g": {}}, "h": "yes"}, "i": []}
+    config = Config(CONFIG_NAME, paths=[], env={}, defaults=[defaults], **kwargs)
+    assert list(config.iter_flat()) == [
+        ("a.b_c", 1),
+        ("a.d.e", [1, {"f": None}]),
+        ("a.d.g", {}),
+        ("a.h", "yes"),
+        ("i", []),
+    ]
+    assert list(config.iter_flat("a.d")) == [("a.d.e", [1, {"f": None}]), ("a.d.g", {})]
+    assert list(config.iter_flat("a.b_c")) == [("a.b_c", 1)]
+    # keys are spelled as stored, whatever spelling of the prefix was passed
+    assert list(config.iter_flat("a.b-c")) == [("a.b_c", 1)]
+    assert config.iter_flat("a").__next__()[1] is config.get("a.b_c")
+
+    stream = io.StringIO()
+    config.dump(stream)
+    assert stream.getvalue() == yaml.safe_dump(defaults, sort_keys=False)
+    stream = io.StringIO()
+    config.dump(stream, key="a.d", fmt="json")
+    assert stream.getvalue() == json.dumps(defaults["a"]["d"], indent=2) + "\n"
+    with pytest.raises(ValueError, match="Unknown format"):
+        config.dump(stream, fmt="toml")  # type: ignore[arg-type]
+    with pytest.raises(KeyError):
+        config.dump(stream, key="missing")